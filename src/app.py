@@ -1,17 +1,71 @@
+import io
+import secrets
+import sys
+import threading
+from datetime import date
 import streamlit as st
-from autofill import autofill, confirm_autofill
 from footer import footer
-from generators import generators, params
-from sheet import authenticate, Sheet
+from generators import generators, SPREADSHEET_URL
+from executor import is_auth_error
+
+# the modules that need gspread, pandas and numpy (sheet, autofill, diagnostics) are imported where they are first used,
+# so that the page is drawn before they are loaded
+
+def warm_up():
+    """
+    Authenticates the google service account and loads the worksheets in the background, shared by every session.
+    On a cold start the modules for reading the sheets are imported in the background too.
+    """
+
+    if 'sheet' in sys.modules:
+        sys.modules['sheet'].warm_up()
+        return
+
+    def work():
+        from sheet import warm_up
+        warm_up()
+
+    threading.Thread(target=work, daemon=True).start()
+
+def view_df(spreadsheet, gen: str, pages: int = 1, dates: tuple = ()):
+    """
+    Returns the rows of a log the viewer shows, either between two dates or the last pages, and whether there are older rows.
+    """
+
+    from sheet import Sheet
+
+    sheet = Sheet(spreadsheet, gen)
+
+    if len(dates) == 2:
+        return (sheet.get_range_df(*dates), False)
+
+    return sheet.get_page_df(pages) # only the latest rows, older pages are loaded on demand
 
 def load_sheet(sheet_container: st.container, gen: str):
 
+    from sheet import get_spreadsheet, reconnect
+
     gen = st.session_state.selected_gen
-    sheet = Sheet(st.session_state['sheet'], gen)
-    df = sheet.get_sheet_as_df()
+    spreadsheet = get_spreadsheet()
+
+    pages = st.session_state.setdefault('pages', {}).get(gen, 1)
+    dates = st.session_state.get('view_dates', ())
+
+    try:
+        df, more = view_df(spreadsheet, gen, pages, dates)
+
+    except Exception as e:
+        if is_auth_error(e):
+            reconnect(spreadsheet) # the next rerun authenticates again
+        raise
 
     with sheet_container:
-        st.dataframe(df, hide_index=True)
+        typed = 'Date' in df and df['Date'].dtype == 'date32[pyarrow]' # left as text if any date does not parse
+        st.dataframe(df, hide_index=True, column_config={'Date': st.column_config.DateColumn(format="DDMMYY")} if typed else None)
+
+        if more and st.button("Load older rows"):
+            st.session_state['pages'][gen] = pages + 1
+            st.rerun()
 
     print(f"Succesfully displayed sheet for gen {gen}")
 
@@ -28,9 +82,6 @@ def page_init():
         }
     )
 
-    if 'autofill' not in st.session_state:
-        st.session_state['autofill'] = False
-
     col1, col2 = st.columns([1, 4], gap='large')
 
     return (col1, col2)
@@ -61,16 +112,78 @@ def display_gen_selection_panel(logger):
         end_date = st.date_input(label="Date to autofill logs until", value="today", format="DD/MM/YYYY")
 
         if st.button("Autofill Logsheets", width='stretch'):
-            confirm_autofill(len(options))
+            from autofill import confirm_autofill
+            st.session_state['seed'] = secrets.randbits(32) # the preview and the autofill plan the same readings
+            confirm_autofill(options, end_date, end_val)
+
+        if 'job' in st.query_params:
+            from autofill import autofill_progress
+            autofill_progress(st.query_params['job']) # runs in the background, the viewer stays usable
+
+        with st.expander("Export all logs"):
+            display_export_panel()
+
+def display_export_panel():
+
+    from export import export_logs, EXPORT_FORMATS
+
+    format = st.radio("Format", list(EXPORT_FORMATS), format_func=EXPORT_FORMATS.get)
 
-        if st.session_state['autofill']:
-            autofill(options, st.session_state['name'], end_date, end_val)
-            st.session_state['name'] = ""
+    if st.button("Prepare export", width='stretch'):
+
+        st.session_state.pop('export', None)
+
+        # the logs are still read one generator at a time, only the compressed archive is held, and freed with the session
+        from sheet import get_spreadsheet
+
+        file = io.BytesIO()
+        bar = st.progress(0.0, text="Exporting...")
+        export_logs(get_spreadsheet(), list(generators.values()), file, format, lambda done, total: bar.progress(done / total, text=f"Exported {done}/{total} logs..."))
+
+        st.session_state['export'] = (file.getvalue(), format)
+        bar.empty()
+
+    if 'export' in st.session_state:
+        data, format = st.session_state['export']
+
+        st.download_button(
+            label="Download",
+            data=data,
+            file_name=f"tcc-genlog-{date.today():%Y%m%d}-{format}.zip",
+            mime='application/zip',
+            width='stretch',
+        )
+
+def display_fleet_status():
+
+    from sheet import fleet_status, get_spreadsheet, reconnect
+
+    spreadsheet = get_spreadsheet()
+
+    try:
+        df = fleet_status(spreadsheet, list(generators.values()))
+
+    except Exception as e:
+        if is_auth_error(e):
+            reconnect(spreadsheet) # the next rerun authenticates again
+        raise
+
+    st.dataframe(
+        df.sort_values(['weeks behind', 'runtime to POL limit'], ascending=[False, True]),
+        hide_index=True,
+        column_config={
+            'latest date': st.column_config.DateColumn(format="DD/MM/YYYY"),
+            'last POL top up': st.column_config.DateColumn(format="DD/MM/YYYY"),
+        },
+    )
 
 def display_view_panel(viewer):
 
     with viewer:
 
+        if st.toggle("Fleet overview", help="Latest entry of every generator, most overdue first"):
+            display_fleet_status()
+
         gen = st.selectbox(
             label="Generator",
             options=list(generators.values()),
@@ -80,15 +193,20 @@ def display_view_panel(viewer):
             width=400,
         )
 
+        st.date_input(label="Dates", value=(), key='view_dates', format="DD/MM/YYYY", width=400, help="Only show the rows between two dates")
+
         sheet_container = st.container()
 
         if gen is not None:
 
             load_sheet(sheet_container, gen)
 
+            from generators import get_registry
+            from sheet import get_spreadsheet
+
             st.link_button(
                 label="Open Sheet",
-                url=f"https://docs.google.com/spreadsheets/d/14vNYY24YcFoJ7-aKJCqSyJboYIX7ZlmY4S_0SS2gFTY/edit?usp=sharing&gid={params[gen]}",
+                url=f"{SPREADSHEET_URL}&gid={get_registry(get_spreadsheet()).gid(gen)}",
                 type="primary",
             )
 
@@ -96,20 +214,24 @@ def display_view_panel(viewer):
 
             st.link_button(
                 label="Open Sheet",
-                url="https://docs.google.com/spreadsheets/d/14vNYY24YcFoJ7-aKJCqSyJboYIX7ZlmY4S_0SS2gFTY/edit?usp=sharing",
+                url=SPREADSHEET_URL,
                 type="primary",
             )
 
 def main():
 
-    # authenticate google service account
-    if 'sheet' not in st.session_state:
-        st.session_state['sheet'] = authenticate()
-
     logger, viewer = page_init()
 
+    # authenticate google service account in the background, shared by every session
+    warm_up()
+
     display_gen_selection_panel(logger)
     display_view_panel(viewer)
+
+    if 'diagnostics' in st.query_params:
+        from diagnostics import diagnostics
+        diagnostics()
+
     footer()
 
 if __name__ == '__main__':
@@ -1,43 +1,105 @@
-import time
 import streamlit as st
+import pandas as pd
 from datetime import date
-from sheet import Sheet
+from jobs import get_job, start_job
+from sheet import get_spreadsheet, preview
 
-@st.dialog("Autofill in progress...", dismissible=False)
-def autofill(gens, name: str="", end_date: date=date.today(), end_val: int | None = None):
+@st.fragment(run_every=1)
+def autofill_progress(id: str):
+    """
+    Shows the progress of a background autofill job, polling it every second until it is done.
+    The job id is kept in the URL, so a reloaded page shows the same job.
+    """
 
-    successes = 0 # this will store the number of sheets updated successfully
+    job = get_job(id)
 
-    error_container = st.container()
+    if job is None:
+        st.write("This autofill is no longer running.")     # e.g. the app restarted
+        if st.button("Dismiss", width='stretch'):
+            del st.query_params['job']
+            st.rerun()
+        return
 
-    with st.empty():
+    progress = job.snapshot()
+    total = len(progress['status'])
+    updated = sum(status == 'updated' for status in progress['status'].values())
+    failed = sum(status == 'failed' for status in progress['status'].values())
 
-        for gen in gens:
+    if progress['resumed'] > 0:
+        st.write(f"Resuming the last autofill, {progress['resumed']} sheets were already updated")
 
-            try:
-                serial_no = gen
-                st.write(f"Updating sheet {serial_no}...")      # display text
+    if progress['finished'] is None:
+        st.progress((updated + failed) / max(total, 1), text=f"Updated {updated + failed}/{total} sheets...")     # display text
+    else:
+        st.write(f"Updated {updated} sheets, could not update {failed} sheets.")
 
-                sheet = Sheet(st.session_state["sheet"], gen)   # actually update sheet
-                sheet.autofill(gen, name, end_date, end_val)
+    with st.expander("Generators", expanded=failed > 0):
+        st.dataframe(pd.DataFrame({
+            'generator': list(progress['status']),
+            'status': list(progress['status'].values()),
+            'error': [progress['errors'].get(gen, "") for gen in progress['status']],
+        }), hide_index=True)
 
-                successes += 1
+    if progress['finished'] is not None:
+        if st.button("Done", width='stretch'):
+            del st.query_params['job']
+            st.rerun()  # reload the whole page, e.g. the log being viewed
 
-            except Exception as e:
-                error_container.write(f"Error updating log for {gen}: {e}")
-                print(f"Error updating log for {gen}: {e}")     # debug text
+def show_preview(gens, end_date: date, end_val: int | None):
+    """
+    Shows the rows autofill would write for every generator, without writing anything.
+    """
 
-        st.write(f"Updated {successes} sheets, could not update {len(gens) - successes} sheets.")
-        print(f"Updated {successes} sheets, could not update {len(gens) - successes} sheets.")
+    with st.spinner("Planning..."):
+        schedule, errors = preview(get_spreadsheet(), gens, end_date, end_val, st.session_state.get('seed'))
 
-    st.session_state['autofill'] = False
-    time.sleep(1)   # to leave the dialog on display for a second
-    st.rerun()      # reload
+    for gen, e in errors.items():
+        st.write(f"Cannot update log for {gen}: {e}")
+
+    if len(schedule) == 0:
+        st.write("Nothing to update.")
+        return
+
+    summary = schedule.groupby('generator', sort=False).agg(
+        rows=('row', 'size'),
+        first_row=('row', 'first'),
+        until=('date', 'last'),
+        final_reading=('reading', 'last'),
+        top_ups=('entry', lambda entries: (entries == "TOP UP POL").sum()),
+    )
+
+    st.dataframe(summary)
+
+    with st.expander("Planned rows"):
+        st.dataframe(schedule, hide_index=True)
+
+def show_problems(gens):
+    """
+    Warns about problems in the logs autofill starts from, e.g. a reading lower than the one before it.
+    """
+
+    from validate import validate
+
+    with st.spinner("Checking logs..."):
+        report = validate(get_spreadsheet(), gens)
+
+    if len(report) == 0:
+        return
+
+    st.warning(f"Found {len(report)} problems in {report['generator'].nunique()} logs, check them in the sheet before autofilling")
+
+    with st.expander("Problems"):
+        st.dataframe(report, hide_index=True)
 
 @st.dialog("Update the selected generators?")
-def confirm_autofill(num_options):
+def confirm_autofill(gens, end_date: date=date.today(), end_val: int | None = None):
+
+    st.write(f"{len(gens)} generators selected")
+    show_problems(gens)
+
+    if st.toggle("Preview changes"):
+        show_preview(gens, end_date, end_val)
 
-    st.write(f"{num_options} generators selected")
     name = st.text_input(label="Name", label_visibility='collapsed', width='stretch', placeholder='Enter name of authorising person (optional)')
     col1, col2 = st.columns(2)
     with col1:
@@ -46,10 +108,9 @@ def confirm_autofill(num_options):
         yes = st.button("Yes", width='stretch', type='primary')
 
     if yes:
-        st.session_state['autofill'] = True
-        st.session_state['name'] = name
+        job = start_job(get_spreadsheet(), gens, name, end_date, end_val, st.session_state.get('seed'))
+        st.query_params['job'] = job.id
         st.rerun()
 
     elif no:
-        st.session_state['autofill'] = False
         st.rerun()
@@ -0,0 +1,153 @@
+"""
+Benchmarks autofill and the log viewer against the in-memory fake spreadsheet (see fake.py).
+
+Reports the API calls, bytes sent and wall time of each scenario:
+    python bench.py [--latency SECONDS]
+
+With --startup, reports how long a fresh process takes to import app.py and to draw the first page instead,
+exiting with status 1 if either is over its budget:
+    python bench.py --startup
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+import cache
+import executor
+import mirror
+import telemetry
+from executor import chunk, run_parallel, RateLimiter, READ_QUOTA, WRITE_QUOTA
+from fake import fake_spreadsheet
+from generators import generators
+from sheet import Sheet
+from writequeue import autofill_batch
+
+GEN_COUNTS = (1, 10, 68)
+SPANS = {'1 month': 4, '3 months': 13, '6 months': 26, '1 year': 52, '2 years': 104} # weeks to backfill
+HISTORY_WEEKS = 104 # weeks of logs already in every sheet
+IMPORT_BUDGET = 0.5 # seconds to import app.py in a fresh process, streamlit included
+FIRST_PAINT_BUDGET = 1.0 # seconds for the first run of app.py, once streamlit is loaded
+STARTUP_RUNS = 3 # fresh processes per measurement, the fastest counts
+
+# run in a fresh process, print the measured seconds
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import app
+print(time.perf_counter() - start)
+"""
+FIRST_PAINT_SCRIPT = """
+import time
+from streamlit.testing.v1 import AppTest
+test = AppTest.from_file('app.py', default_timeout=60)
+start = time.perf_counter()
+test.run()
+assert len(test.title) > 0 and len(test.exception) == 0
+print(time.perf_counter() - start)
+"""
+
+def reset():
+    """
+    Starts every scenario with full quotas and empty caches, so scenarios do not affect each other.
+    """
+
+    executor.limiters.update({'read': RateLimiter(READ_QUOTA), 'write': RateLimiter(WRITE_QUOTA)})
+    cache.df_cache.clear()
+
+def run_autofill(gens: list[str], weeks: int, latency: float) -> dict:
+
+    end_date = date.today()
+    sheet = fake_spreadsheet(gens, HISTORY_WEEKS, end_date - timedelta(days=7 * weeks), latency=latency)
+    reset()
+
+    start = time.perf_counter()
+    failed = 0
+
+    for jobs, results, error in run_parallel(lambda jobs: autofill_batch(sheet, jobs, "", end_date), chunk(gens)):
+        failed += len(jobs) if error is not None else sum(e is not None for e in results.values())
+
+    wall = time.perf_counter() - start
+
+    if failed > 0:
+        print(f"{failed} generators failed to autofill") # debug text
+
+    return {**sheet.stats, 'wall': wall}
+
+def run_viewer(gen: str, latency: float) -> tuple[dict, dict]:
+
+    sheet = fake_spreadsheet([gen], HISTORY_WEEKS, latency=latency)
+    reset()
+
+    results = []
+    for _ in range(2): # cold, then warm
+
+        sheet.reset_stats()
+        start = time.perf_counter()
+        Sheet(sheet, gen).get_sheet_as_df()
+        results.append({**sheet.stats, 'wall': time.perf_counter() - start})
+
+    return tuple(results)
+
+def run_startup(script: str) -> float:
+    """
+    Returns the fastest of STARTUP_RUNS measurements of script, each in a fresh process so nothing is imported yet.
+    """
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    times = []
+
+    for _ in range(STARTUP_RUNS):
+        result = subprocess.run([sys.executable, '-c', script], cwd=directory, capture_output=True, text=True, check=True)
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+
+    return min(times)
+
+def startup() -> bool:
+
+    over = False
+
+    for name, script, budget in (('import app.py', IMPORT_SCRIPT, IMPORT_BUDGET), ('first paint', FIRST_PAINT_SCRIPT, FIRST_PAINT_BUDGET)):
+        seconds = run_startup(script)
+        over |= seconds > budget
+        print(f"{name:<32} {seconds:>9.3f}s (budget {budget:.1f}s){' OVER BUDGET' if seconds > budget else ''}")
+
+    return not over
+
+def report(name: str, stats: dict):
+
+    print(f"{name:<32} {sum(stats['calls'].values()):>6} {stats['bytes_sent']:>12,} {stats['bytes_received']:>14,} {stats['wall']:>9.3f}s")
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark autofill and the log viewer against a fake spreadsheet")
+    parser.add_argument('--latency', type=float, default=0.1, help="seconds added to every API call (default 0.1)")
+    parser.add_argument('--startup', action='store_true', help="benchmark the import time and first paint of the app instead")
+    args = parser.parse_args()
+
+    if args.startup:
+        sys.exit(0 if startup() else 1)
+
+    mirror.MIRROR_DIR = ':memory:' # every fake spreadsheet gets its own empty mirror
+    telemetry.logger.setLevel(logging.WARNING) # no log line for every call
+    serials = list(generators.values())
+
+    print(f"{'scenario':<32} {'calls':>6} {'bytes sent':>12} {'bytes received':>14} {'wall':>10}")
+
+    for count in GEN_COUNTS:
+        report(f"autofill {count} gens, 1 month", run_autofill(serials[:count], SPANS['1 month'], args.latency))
+
+    for span, weeks in SPANS.items():
+        if len(serials) in GEN_COUNTS and weeks == SPANS['1 month']:
+            continue # measured above
+        report(f"autofill {len(serials)} gens, {span}", run_autofill(serials, weeks, args.latency))
+
+    cold, warm = run_viewer(serials[0], args.latency)
+    report(f"viewer {HISTORY_WEEKS} weeks, cold", cold)
+    report(f"viewer {HISTORY_WEEKS} weeks, warm", warm)
+
+if __name__ == '__main__':
+    main()
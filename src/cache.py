@@ -0,0 +1,36 @@
+import threading
+from cachetools import TTLCache
+
+DF_CACHE_SIZE = 16      # number of generator logs kept in memory, least recently used are evicted first
+DF_CACHE_TTL = 300      # seconds before a cached log is downloaded again
+
+FLEET = '*'             # key of the views built from every generator's log, dropped whenever any sheet is written to
+
+df_cache = TTLCache(maxsize=DF_CACHE_SIZE, ttl=DF_CACHE_TTL) # gen -> DataFrame, shared by every session
+df_cache_lock = threading.Lock()
+
+def get_df(gen: str, load, *key):
+    """
+    Returns the cached DataFrame of a generator, calling load() to build it if it is missing or expired.
+    Different views of the same log (e.g. a page of it) are cached separately by key.
+    """
+
+    with df_cache_lock:
+        df = df_cache.get((gen, *key))
+
+    if df is None:
+        df = load()
+
+        with df_cache_lock:
+            df_cache[(gen, *key)] = df
+
+    return df
+
+def invalidate(gens):
+    """
+    Drops every cached DataFrame of gens and every fleet view, called whenever their sheets are written to.
+    """
+
+    with df_cache_lock:
+        for cached in [cached for cached in df_cache.keys() if cached[0] in gens or cached[0] == FLEET]:
+            df_cache.pop(cached, None)
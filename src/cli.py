@@ -0,0 +1,160 @@
+"""
+Autofills generator logs from the command line, without the Streamlit app, e.g. for a weekly cron job:
+    python cli.py --all --until 2025-06-30 --credentials service_account.json
+    python cli.py GEN [GEN ...] [--reading READING] [--name NAME] [--jobs N] [--dry-run]
+
+or exports the whole logs to a zip archive instead, e.g. for audits:
+    python cli.py --all --export logs.zip [--format parquet|csv]
+
+Debug output goes to stderr, and a JSON summary of every generator to stdout.
+Exits with status 1 if any generator could not be autofilled.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import secrets
+import sys
+from datetime import date
+from executor import chunk, run_parallel, MAX_WORKERS
+from export import export_logs, EXPORT_FORMATS
+from generators import generators
+from journal import get_journal, run_id
+from sheet import authenticate, preview
+from writequeue import autofill_batch
+
+def parse_args() -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(description="Autofill generator logs up to a date")
+    parser.add_argument('gens', nargs='*', metavar='GEN', help="serial numbers of the generators to autofill")
+    parser.add_argument('--all', action='store_true', help="autofill every generator")
+    parser.add_argument('--until', type=date.fromisoformat, default=date.today(), help="date to autofill logs until, YYYY-MM-DD (default today)")
+    parser.add_argument('--reading', type=float, default=None, help="final generator reading (only for a single generator)")
+    parser.add_argument('--name', default="", help="name of the authorising person")
+    parser.add_argument('--jobs', type=int, default=MAX_WORKERS, help=f"jobs run at once (default {MAX_WORKERS})")
+    parser.add_argument('--dry-run', action='store_true', help="plan the rows without writing them")
+    parser.add_argument('--export', metavar='FILE', default=None, help="export the logs to a zip archive instead of autofilling them")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='parquet', help="export format (default parquet)")
+    parser.add_argument('--credentials', default=os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'),
+                        help="service account JSON key file (default $GOOGLE_APPLICATION_CREDENTIALS, else the Streamlit secrets)")
+
+    args = parser.parse_args()
+    known = list(generators.values())
+
+    if args.all:
+        args.gens = known
+    elif len(args.gens) == 0:
+        parser.error("give at least one generator or --all")
+
+    unknown = [gen for gen in args.gens if gen not in known]
+    if len(unknown) > 0:
+        parser.error(f"unknown generators: {', '.join(unknown)}")
+
+    if args.reading is not None and len(args.gens) > 1:
+        parser.error("--reading only applies to a single generator")
+
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    return args
+
+def dry_run(sheet, args: argparse.Namespace) -> dict[str, dict]:
+    """
+    Returns a summary of the rows planned for every generator, without writing anything.
+    """
+
+    seed = secrets.randbits(32)
+    summary = {}
+
+    def plan(jobs: list[str]):
+        return preview(sheet, jobs, args.until, args.reading, seed)
+
+    for jobs, result, error in run_parallel(plan, chunk(args.gens), args.jobs):
+
+        if error is not None:
+            summary.update({gen: {'status': 'failed', 'error': str(error)} for gen in jobs})
+            continue
+
+        schedule, errors = result
+        summary.update({gen: {'status': 'failed', 'error': str(e)} for gen, e in errors.items()})
+
+        if len(schedule) == 0:
+            continue
+
+        for gen, rows in schedule.groupby('generator', sort=False):
+            summary[gen] = {
+                'status': 'planned',
+                'rows': len(rows),
+                'first_row': int(rows['row'].iloc[0]),
+                'until': rows['date'].dropna().iloc[-1],
+                'final_reading': float(rows['reading'].dropna().iloc[-1]),
+                'top_ups': int((rows['entry'] == "TOP UP POL").sum()),
+            }
+
+    for gen in args.gens:
+        summary.setdefault(gen, {'status': 'up to date'})
+
+    return summary
+
+def autofill(sheet, args: argparse.Namespace) -> dict[str, dict]:
+    """
+    Autofills every generator, journaling the run so that running the same command again resumes it (see journal.py).
+    """
+
+    run = run_id(sheet, args.gens, args.name, args.until, args.reading)
+    summary = {}
+
+    def update(jobs: list[str]):
+        return autofill_batch(sheet, jobs, args.name, args.until, args.reading, run=run)
+
+    for jobs, results, error in run_parallel(update, chunk(args.gens), args.jobs):
+
+        if error is not None:
+            results = {gen: error for gen in jobs}
+
+        for gen, e in results.items():
+            summary[gen] = {'status': 'updated'} if e is None else {'status': 'failed', 'error': str(e)}
+
+    if all(result['status'] == 'updated' for result in summary.values()):
+        get_journal(sheet).finish(run)
+
+    return summary
+
+def main():
+
+    args = parse_args()
+    info = None
+
+    if args.credentials is not None:
+        with open(args.credentials) as f:
+            info = json.load(f)
+
+    with contextlib.redirect_stdout(sys.stderr): # keep stdout for the summary
+
+        sheet = authenticate(info)
+        if sheet is None:
+            sys.exit(2)
+
+        if args.export is not None:
+            export_logs(sheet, args.gens, args.export, args.format)
+        else:
+            summary = dry_run(sheet, args) if args.dry_run else autofill(sheet, args)
+
+    if args.export is not None:
+        print(json.dumps({'export': args.export, 'format': args.format, 'generators': args.gens}, indent=2))
+        return
+
+    failed = sum(result['status'] == 'failed' for result in summary.values())
+
+    print(json.dumps({
+        'until': args.until.isoformat(),
+        'dry_run': args.dry_run,
+        'generators': {gen: summary[gen] for gen in args.gens},
+        'failed': failed,
+    }, indent=2))
+
+    sys.exit(1 if failed > 0 else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,19 @@
+"""
+Runs every test against in-memory mirrors and journals (see fake.py for the spreadsheet), without the API quotas.
+"""
+
+import logging
+import pytest
+import executor
+import journal
+import mirror
+import telemetry
+
+@pytest.fixture(autouse=True)
+def offline(monkeypatch):
+
+    monkeypatch.setattr(mirror, 'MIRROR_DIR', ':memory:')
+    monkeypatch.setattr(journal, 'JOURNAL_DIR', ':memory:')
+    for kind in ('read', 'write', 'drive'):
+        monkeypatch.setitem(executor.limiters, kind, executor.RateLimiter(10 ** 6, 1))
+    telemetry.logger.setLevel(logging.WARNING) # no log line for every call
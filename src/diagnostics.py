@@ -0,0 +1,69 @@
+import time
+import streamlit as st
+import pandas as pd
+from telemetry import snapshot, reset, LATENCY_BUCKETS
+
+def op_table(ops: dict) -> pd.DataFrame:
+
+    rows = [{
+        'operation': op,
+        'calls': entry['calls'],
+        'errors': entry['errors'],
+        '429s': entry['quota_errors'],
+        'avg ms': round(entry['seconds'] / entry['calls'] * 1000, 1),
+        'max ms': round(entry['max_seconds'] * 1000, 1),
+        'KB sent': round(entry['bytes_sent'] / 1024, 1),
+        'KB received': round(entry['bytes_received'] / 1024, 1),
+    } for op, entry in ops.items()]
+
+    return pd.DataFrame(rows)
+
+def gen_table(gens: dict) -> pd.DataFrame:
+
+    rows = [{
+        'generator': gen,
+        'calls': entry['calls'],
+        'errors': entry['errors'],
+        '429s': entry['quota_errors'],
+        'avg ms': round(entry['seconds'] / entry['calls'] * 1000, 1),
+        'max ms': round(entry['max_seconds'] * 1000, 1),
+    } for gen, entry in gens.items()]
+
+    return pd.DataFrame(rows).sort_values('avg ms', ascending=False)
+
+def histogram(ops: dict) -> pd.DataFrame:
+    """
+    Returns the number of calls of every operation in each latency bucket, one row per bucket.
+    """
+
+    labels = [f"≤ {bound:g}s" for bound in LATENCY_BUCKETS] + [f"> {LATENCY_BUCKETS[-1]:g}s"]
+
+    return pd.DataFrame({op: entry['histogram'] for op, entry in ops.items()}, index=labels)
+
+def diagnostics():
+    """
+    Shows the API call stats of this server process, only when the page is opened with ?diagnostics in the URL.
+    """
+
+    if 'diagnostics' not in st.query_params:
+        return
+
+    stats = snapshot()
+
+    with st.expander("Diagnostics", expanded=True):
+
+        st.caption(f"API calls since {time.strftime('%d/%m/%Y %H:%M:%S', time.localtime(stats['since']))}, shared by every session")
+
+        if len(stats['ops']) == 0:
+            st.write("No API calls yet.")
+
+        else:
+            st.dataframe(op_table(stats['ops']), hide_index=True)
+            st.bar_chart(histogram(stats['ops']), x_label="Latency", y_label="Calls")
+
+            if len(stats['gens']) > 0:
+                st.dataframe(gen_table(stats['gens']), hide_index=True)
+
+        if st.button("Reset stats"):
+            reset()
+            st.rerun()
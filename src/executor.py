@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from google.auth.exceptions import RefreshError, TransportError
+from telemetry import payload_size, record
+
+READ_QUOTA = 60         # Sheets API read requests per minute per user
+WRITE_QUOTA = 60        # Sheets API write requests per minute per user
+DRIVE_QUOTA = 12000     # Drive API requests per minute per user
+MAX_WORKERS = 4         # number of threads doing network I/O at once
+GENS_PER_JOB = 10       # generators read and written together by a single thread
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0      # seconds, doubled after every 429 response
+BACKOFF_MAX = 32.0
+
+class RateLimiter:
+    """
+    Token bucket shared between threads. Holds up to rate tokens, refilled continuously over every period seconds.
+    """
+
+    def __init__(self, rate: int, period: float = 60.0):
+
+        self.rate = rate
+        self.period = period
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until a token is available, then takes it.
+        """
+
+        while True:
+
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.period)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) * self.period / self.rate
+
+            time.sleep(wait)
+
+limiters = {
+    'read': RateLimiter(READ_QUOTA),
+    'write': RateLimiter(WRITE_QUOTA),
+    'drive': RateLimiter(DRIVE_QUOTA),
+}
+
+def is_quota_error(e: Exception) -> bool:
+
+    response = getattr(e, 'response', None)
+    return getattr(response, 'status_code', None) == 429
+
+def is_auth_error(e: Exception) -> bool:
+    """
+    Returns True if e means the client can no longer authenticate, so the shared handle should be reopened.
+    """
+
+    response = getattr(e, 'response', None)
+    return isinstance(e, (RefreshError, TransportError)) or getattr(response, 'status_code', None) == 401
+
+def call(kind: str, fn, *args, op: str | None = None, gens: list[str] = [], **kwargs):
+    """
+    Calls fn once the read, write or drive quota allows it, retrying with exponential backoff if the API responds with 429.
+    Every attempt is recorded in telemetry under op (fn's name by default) and the generators it touches.
+    """
+
+    op = fn.__name__ if op is None else op
+    sent = payload_size([args, kwargs])
+
+    for attempt in range(MAX_RETRIES + 1):
+
+        limiters[kind].acquire()
+        start = time.perf_counter()
+
+        try:
+            result = fn(*args, **kwargs)
+
+        except Exception as e:
+            quota_error = is_quota_error(e)
+            record(kind, op, gens, time.perf_counter() - start, sent, 0, e, quota_error)
+
+            if not quota_error or attempt == MAX_RETRIES:
+                raise
+
+            delay = min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) + random.uniform(0, BACKOFF_BASE)
+            print(f"Quota exceeded, retrying in {delay:.1f}s") # debug text
+            time.sleep(delay)
+
+        else:
+            record(kind, op, gens, time.perf_counter() - start, sent, payload_size(result))
+            return result
+
+def chunk(items: list, size: int = GENS_PER_JOB) -> list[list]:
+
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def run_parallel(fn, items: list, max_workers: int = MAX_WORKERS):
+    """
+    Runs fn on every item in a thread pool, yielding (item, result, error) in the order they finish.
+    error is None if fn returned normally.
+    """
+
+    if len(items) == 0:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+
+        futures = {pool.submit(fn, item): i for i, item in enumerate(items)}
+
+        for future in as_completed(futures):
+            item = items[futures[future]]
+            try:
+                yield (item, future.result(), None)
+            except Exception as e:
+                yield (item, None, e)
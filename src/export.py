@@ -0,0 +1,54 @@
+import io
+import zipfile
+from typing import TYPE_CHECKING
+from executor import chunk
+
+if TYPE_CHECKING: # the modules reading the sheets are imported on first use, so the app can list the formats before loading them
+    import gspread
+
+EXPORT_FORMATS = {
+    'parquet': "Parquet dataset, partitioned by generator",
+    'csv': "CSV file per generator",
+}
+
+def export_logs(sheet: 'gspread.spreadsheet.Spreadsheet', gens: list[str], file, format: str = 'parquet', progress=None):
+    """
+    Writes the whole log of every generator in gens to file (a path or a binary file object) as a zip archive of either
+    a Parquet dataset partitioned by generator (generator=<serial>/part-0.parquet) or one CSV file per generator.
+    Every column is the text in the sheet under the viewer's column names, besides the sheet row number in Row.
+    The logs are read a batch of tabs per request into the local mirror and written one generator at a time,
+    so that only one log is held in memory. progress(done, total) is called after every generator.
+    API CALLS: 1-3 for every GENS_PER_JOB generators (more for tabs with over SYNC_WINDOW rows to fetch)
+    """
+
+    from mirror import get_mirror, HEADER_ROW
+    from sheet import Sheet
+
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {format}")
+
+    mirror = get_mirror(sheet)
+    done = 0
+
+    with zipfile.ZipFile(file, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+
+        for jobs in chunk(gens):
+
+            mirror.sync(sheet, jobs)    # the rows appended since the last read
+            mirror.extend(sheet, jobs)  # the rows before the window autofill or the viewer read
+
+            for gen in jobs:
+                # the cells as written, so that nothing that is not a valid date or number is lost
+                df = Sheet(sheet, gen).mirrored_df(HEADER_ROW + 1, typed=False).rename_axis('Row').reset_index()
+
+                if format == 'parquet':
+                    with archive.open(f"generator={gen}/part-0.parquet", 'w') as f:
+                        df.to_parquet(f, index=False)
+
+                else:
+                    with archive.open(f"{gen}.csv", 'w') as f, io.TextIOWrapper(f, encoding='utf-8', newline='') as text:
+                        df.to_csv(text, index=False)
+
+                done += 1
+                if progress is not None:
+                    progress(done, len(gens))
@@ -0,0 +1,367 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import date, timedelta
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range, fill_gaps, numericise_all, to_records
+from utility import DATE_WRITE_FORMAT, DATE_COL, ADDRESS_COL, ENTRY_COL, RUNTIME_COL, READING_COL, NAME_COL
+
+HEADER = [
+    "Date", "To (State address. Each journey to be written on a separate line)", "Requisitioner's Designation and Purpose",
+    "Time", "", "Travelling Time in minutes", "Runtime", "Meter reading at journey's end. If not working write \"N.W.\"",
+    "Driver's No. if any and Signature", "Fuel", "Oil", "Remarks",
+    "Name and initials of person accompanying vehicle / authorising the journey",
+]
+
+class FakeResponse:
+    """
+    Stands in for the requests.Response that gspread.exceptions.APIError is built from.
+    """
+
+    def __init__(self, status_code: int, message: str, status: str = 'RESOURCE_EXHAUSTED'):
+
+        self.status_code = status_code
+        self.text = message
+        self.status = status
+
+    def json(self) -> dict:
+
+        return {'error': {'code': self.status_code, 'message': self.text, 'status': self.status}}
+
+def format_value(value) -> str:
+    """
+    Renders a written value the way the Sheets API returns it as a FORMATTED_VALUE.
+    """
+
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def parse_range(range_name: str) -> tuple[str, dict]:
+    """
+    Splits an absolute A1 range such as 'tab'!A1:M5 into the tab title and its grid range.
+    """
+
+    title, _, a1 = range_name.rpartition('!')
+    if title.startswith("'"):
+        title = title[1:-1].replace("''", "'")
+
+    return (title, a1_range_to_grid_range(a1))
+
+class FakeWorksheet:
+    """
+    In-memory worksheet implementing the parts of gspread.worksheet.Worksheet used by the app.
+    """
+
+    def __init__(self, spreadsheet: 'FakeSpreadsheet', title: str, id: int, rows: list[list[str]]):
+
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = id
+        self.rows = rows
+        self.row_count = max(1000, len(rows))
+        self.col_count = 26
+
+    def cells(self, grid: dict) -> list[list[str]]:
+        """
+        Returns the values in a grid range, without trailing empty rows and cells like the API does.
+        """
+
+        start_row = grid.get('startRowIndex', 0)
+        end_row = min(grid.get('endRowIndex', self.row_count), len(self.rows))
+        start_col = grid.get('startColumnIndex', 0)
+        end_col = grid.get('endColumnIndex', self.col_count)
+
+        values = [list(row[start_col:end_col]) for row in self.rows[start_row:end_row]]
+
+        for row in values:
+            while len(row) > 0 and row[-1] == '':
+                row.pop()
+
+        while len(values) > 0 and len(values[-1]) == 0:
+            values.pop()
+
+        return values
+
+    def write(self, grid: dict, values: list[list]):
+        """
+        Writes values from the top left of a grid range, skipping None like the API does.
+        """
+
+        start_row = grid.get('startRowIndex', 0)
+        start_col = grid.get('startColumnIndex', 0)
+
+        for i, cells in enumerate(values):
+
+            while len(self.rows) <= start_row + i:
+                self.rows.append([])
+
+            row = self.rows[start_row + i]
+
+            for j, value in enumerate(cells):
+                if value is None:
+                    continue
+
+                while len(row) <= start_col + j:
+                    row.append('')
+
+                row[start_col + j] = format_value(value)
+
+        self.row_count = max(self.row_count, len(self.rows))
+
+    def col_values(self, col: int) -> list[str]:
+
+        self.spreadsheet.request('read', 'col_values', [self.title], (col,))
+        values = [row[col - 1] if len(row) >= col else '' for row in self.rows]
+
+        while len(values) > 0 and values[-1] == '':
+            values.pop()
+
+        return self.spreadsheet.respond(values)
+
+    def get(self, range_name: str | None = None) -> list[list[str]]:
+
+        self.spreadsheet.request('read', 'get', [self.title], range_name)
+        grid = {} if range_name is None else a1_range_to_grid_range(range_name)
+
+        return self.spreadsheet.respond(self.cells(grid))
+
+    def get_all_records(self) -> list[dict]:
+
+        self.spreadsheet.request('read', 'get_all_records', [self.title], None)
+        rows = fill_gaps(self.cells({}))
+
+        if len(rows) == 0:
+            return self.spreadsheet.respond([])
+
+        return self.spreadsheet.respond(to_records(rows[0], [numericise_all(row) for row in rows[1:]]))
+
+    def update_cells(self, cell_list: list):
+
+        self.spreadsheet.request('write', 'update_cells', [self.title], [(cell.row, cell.col, cell.value) for cell in cell_list])
+
+        for cell in cell_list:
+            self.write({'startRowIndex': cell.row - 1, 'startColumnIndex': cell.col - 1}, [[cell.value]])
+
+        return self.spreadsheet.respond({'updatedCells': len(cell_list)})
+
+class FakeSpreadsheet:
+    """
+    In-memory stand-in for gspread.spreadsheet.Spreadsheet, for running Sheet without Google credentials.
+
+    Every request sleeps for latency (+ up to jitter) seconds and is counted in stats, together with the
+    JSON size of what was sent and received. Requests beyond read_quota / write_quota per quota_period
+    seconds, and the next n requests after inject_quota_errors(n), fail with a 429 APIError.
+    Like Drive, get_lastUpdateTime only reports a write once it is drive_lag seconds old.
+    Like the Sheets API, a batch with a range on a tab that does not exist fails whole with a 400 APIError.
+    """
+
+    def __init__(self, tabs: dict[str, list[list[str]]], latency: float = 0.0, jitter: float = 0.0,
+                 read_quota: int | None = None, write_quota: int | None = None, quota_period: float = 60.0, drive_lag: float = 0.0):
+
+        self.id = f"fake-{uuid.uuid4().hex}"
+        self.title = 'tcc-genlog'
+        self.latency = latency
+        self.jitter = jitter
+        self.quotas = {'read': read_quota, 'write': write_quota, 'drive': None}
+        self.quota_period = quota_period
+        self.lock = threading.Lock()
+        self.history = {'read': deque(), 'write': deque(), 'drive': deque()}
+        self.pending_errors = 0
+        self.drive_lag = drive_lag
+        self.changes = deque([time.time()]) # times the spreadsheet was modified, from the last one Drive reports
+
+        self.tabs = {title: FakeWorksheet(self, title, 1000 + i, rows) for i, (title, rows) in enumerate(tabs.items())}
+        self.reset_stats()
+
+    def reset_stats(self):
+
+        with self.lock:
+            self.stats = {'calls': Counter(), 'gens': Counter(), 'bytes_sent': 0, 'bytes_received': 0, 'quota_errors': 0}
+
+    def inject_quota_errors(self, n: int):
+
+        with self.lock:
+            self.pending_errors += n
+
+    def request(self, kind: str, op: str, gens: list[str], payload):
+        """
+        Simulates sending a request: counts it, enforces the quotas and waits for the latency.
+        """
+
+        with self.lock:
+            now = time.monotonic()
+            history = self.history[kind]
+
+            while len(history) > 0 and now - history[0] > self.quota_period:
+                history.popleft()
+
+            self.stats['calls'][op] += 1
+            self.stats['bytes_sent'] += len(json.dumps(payload, default=str))
+
+            quota = self.quotas[kind]
+            if self.pending_errors > 0 or (quota is not None and len(history) >= quota):
+                self.pending_errors = max(0, self.pending_errors - 1)
+                self.stats['quota_errors'] += 1
+                raise APIError(FakeResponse(429, f"Quota exceeded for {kind} requests"))
+
+            history.append(now)
+
+            if kind == 'write':
+                self.changes.append(time.time())
+
+            for gen in gens:
+                self.stats['gens'][gen] += 1
+
+        time.sleep(self.latency + random.uniform(0, self.jitter))
+
+    def respond(self, response):
+
+        with self.lock:
+            self.stats['bytes_received'] += len(json.dumps(response, default=str))
+
+        return response
+
+    def check_ranges(self, ranges: list[str]):
+
+        for range_name in ranges:
+            if parse_range(range_name)[0] not in self.tabs:
+                raise APIError(FakeResponse(400, f"Unable to parse range: {range_name}", 'INVALID_ARGUMENT'))
+
+    def tab(self, title: str) -> FakeWorksheet:
+
+        if title not in self.tabs:
+            raise WorksheetNotFound(title)
+
+        return self.tabs[title]
+
+    def fetch_sheet_metadata(self, params: dict | None = None) -> dict:
+
+        self.request('read', 'fetch_sheet_metadata', [], params)
+
+        return self.respond({
+            'properties': {'title': self.title},
+            'sheets': [
+                {'properties': {
+                    'sheetId': tab.id,
+                    'title': tab.title,
+                    'index': i,
+                    'gridProperties': {'rowCount': tab.row_count, 'columnCount': tab.col_count},
+                }}
+                for i, tab in enumerate(self.tabs.values())
+            ],
+        })
+
+    def worksheets(self) -> list[FakeWorksheet]:
+
+        self.fetch_sheet_metadata()
+        return list(self.tabs.values())
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+
+        self.fetch_sheet_metadata()
+        return self.tab(title)
+
+    def values_get(self, range_name: str, params: dict | None = None) -> dict:
+
+        return self.values_batch_get([range_name], params)['valueRanges'][0]
+
+    def values_batch_get(self, ranges: list[str], params: dict | None = None) -> dict:
+
+        self.request('read', 'values_batch_get', [parse_range(range_name)[0] for range_name in ranges], {'ranges': ranges, 'params': params})
+        self.check_ranges(ranges)
+
+        value_ranges = []
+        for range_name in ranges:
+            title, grid = parse_range(range_name)
+            values = self.tab(title).cells(grid)
+
+            if (params or {}).get('majorDimension') == 'COLUMNS':
+                values = [list(col) for col in zip(*fill_gaps(values))] if len(values) > 0 else []
+                for col in values:
+                    while len(col) > 0 and col[-1] == '':
+                        col.pop()
+
+            value_range = {'range': range_name, 'majorDimension': (params or {}).get('majorDimension', 'ROWS')}
+            if len(values) > 0:
+                value_range['values'] = values
+            value_ranges.append(value_range)
+
+        return self.respond({'spreadsheetId': self.id, 'valueRanges': value_ranges})
+
+    def values_batch_update(self, body: dict) -> dict:
+
+        self.request('write', 'values_batch_update', [parse_range(data['range'])[0] for data in body['data']], body)
+        self.check_ranges([data['range'] for data in body['data']])
+
+        for data in body['data']:
+            title, grid = parse_range(data['range'])
+            self.tab(title).write(grid, data['values'])
+
+        return self.respond({'spreadsheetId': self.id, 'totalUpdatedRanges': len(body['data'])})
+
+    def get_lastUpdateTime(self) -> str:
+
+        self.request('drive', 'get_lastUpdateTime', [], None)
+
+        with self.lock:
+            while len(self.changes) > 1 and self.changes[1] <= time.time() - self.drive_lag:
+                self.changes.popleft()
+            modified = self.changes[0]
+
+        return self.respond(time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(modified)) + f".{int(modified * 1000) % 1000:03d}Z")
+
+    def edit(self, title: str, values: list):
+        """
+        Appends a row to a tab like someone typing it into the sheet, without it counting as a request of the app.
+        """
+
+        with self.lock:
+            tab = self.tab(title)
+            tab.write({'startRowIndex': len(tab.cells({})), 'startColumnIndex': 0}, [values]) # under the last row with anything in it
+            self.changes.append(time.time())
+
+def make_row(cells: dict[int, str | float]) -> list[str | float | None]:
+    """
+    Returns a row of values from a dict of column -> value, with the other cells left as None.
+    """
+    row = [None] * max(cells)
+    for col, value in cells.items():
+        row[col - 1] = value
+    return row
+
+def make_log(weeks: int, end_date: date = date.today(), reading: float = 100.0) -> list[list[str]]:
+    """
+    Returns the rows of a generator log with weekly EAS entries up to end_date, like the ones autofill writes.
+    """
+
+    rows = [list(HEADER), ['']]
+    entry_date = end_date - timedelta(days=7 * weeks)
+
+    for _ in range(weeks + 1):
+        reading += 0.5
+        rows.append([format_value(value) for value in make_row({
+            DATE_COL: entry_date.strftime(DATE_WRITE_FORMAT),
+            ADDRESS_COL: "JC1",
+            ENTRY_COL: "EAS",
+            RUNTIME_COL: 0.5,
+            READING_COL: reading,
+            NAME_COL: "",
+        })])
+        entry_date += timedelta(days=7)
+
+    return rows
+
+def fake_spreadsheet(gens: list[str], weeks: int = 52, end_date: date = date.today(), **kwargs) -> FakeSpreadsheet:
+    """
+    Returns a FakeSpreadsheet with a log of the given number of weeks for every generator in gens.
+    """
+
+    return FakeSpreadsheet({gen: make_log(weeks, end_date) for gen in gens}, **kwargs)
@@ -1,3 +1,13 @@
+import threading
+from typing import TYPE_CHECKING
+from executor import call
+
+if TYPE_CHECKING: # gspread is imported on first use, so the app can draw the page before loading it
+    import gspread
+
+SPREADSHEET_KEY = '14vNYY24YcFoJ7-aKJCqSyJboYIX7ZlmY4S_0SS2gFTY'
+SPREADSHEET_URL = f"https://docs.google.com/spreadsheets/d/{SPREADSHEET_KEY}/edit?usp=sharing"
+
 generators = {
     '22206 Gen 1': '12A3B11512',
     '22206 Gen 2': '12A3B11516',
@@ -70,74 +80,70 @@ generators = {
     # 'test': 'test',
 }
 
-params = {
-    '12A3B11512': '1456630303',
-    '12A3B11516': '1680716109',
-    '12A3B12319': '1391264413',
-    '12A3B12414': '780918704',
-    '12A3B12318': '594418203',
-    '12A3B12315': '1632594844',
-    '12A3B12313': '0',
-    '12A3B12320': '1565705999',
-    '12A3B12324': '1827952013',
-    '12A3B12413': '567654025',
-    '12A3B11499': '693270072',
-    '12A3B11500': '145655296',
-    '12A3B11686': '1669857506',
-    '12A3B11636': '2066410933',
-    '12A3B11702': '143600329',
-    '12A3B11827': '394294654',
-    '12A3B11600': '82825197',
-    '12A3B11658': '1826102220',
-    '12A3B11708': '1589466985',
-    '12A3B11828': '233975077',
-    '12A3B11501': '1548423594',
-    '12A3B11502': '1349061166',
-    '12A3B11654': '812171817',
-    '12A3B11653': '964393425',
-    '12A3B11651': '1150879044',
-    '12A3B11652': '1444715098',
-    '12A3B11642': '831449051',
-    '12A3B11645': '1681978883',
-    '12A3B11187': '625116275',
-    '12A3B11191': '450710157',
-    '12A3B11694': '551979874',
-    '12A3B11829': '823029046',
-    '12A3B11695': '493893068',
-    '12A3B11707': '1811684193',
-    '12A3B11826': '1313379771',
-    '12A3B11830': '42977398',
-    '12A3B10655': '231592662',
-    '12A3B10588': '1842455354',
-    '12A3B11706': '1403401751',
-    '12A3B11712': '160560252',
-    '12A3B12416': '2070758637',
-    '12A3B12415': '689748833',
-    '12A3B11831': '146888505',
-    '12A3B11703': '321804564',
-    '12A3B11099': '1684782454',
-    '12A3B11081': '1301064758',
-    '12A3B11506': '1465820721',
-    '12A3B11504': '1783770061',
-    '12A3B11518': '1043807936',
-    '12A3B11517': '1965366515',
-    '12A3B11525': '55855054',
-    '12A3B11524': '356509010',
-    '12A3B11523': '2022411091',
-    '12A3B11522': '1353289167',
-    '12A3B11526': '1643132703',
-    '12A3B11527': '1125163976',
-    '12A3B11529': '1066378061',
-    '12A3B11528': '50369798',
-    '12A3B11563': '1856562324',
-    '12A3B11531': '574703078',
-    '12A3B11567': '836652923',
-    '12A3B11566': '323210467',
-    '12A3B11569': '1324439134',
-    '12A3B11568': '2003372952',
-    '12A3B11537': '653802557',
-    '12A3B11536': '55557915',
-    '12A3B11538': '49090263',
-    '12A3B11540': '2094784457',
-    # 'test': '1809334135',
-}
+class Registry:
+    """
+    All worksheets of the spreadsheet, loaded with a single metadata request and cached by serial and gid.
+    """
+
+    def __init__(self, spreadsheet: 'gspread.spreadsheet.Spreadsheet'):
+
+        self.spreadsheet = spreadsheet
+        self.lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """
+        Reloads every worksheet of the spreadsheet.
+        API CALLS: 1
+        """
+
+        worksheets = call('read', self.spreadsheet.worksheets) # 1 fetch_sheet_metadata call for every tab
+
+        with self.lock:
+            self.by_serial = {worksheet.title: worksheet for worksheet in worksheets}
+            self.by_gid = {worksheet.id: worksheet for worksheet in worksheets}
+
+        print(f"Loaded {len(worksheets)} worksheets") # debug text
+
+    def worksheet(self, serial: str) -> 'gspread.worksheet.Worksheet':
+        """
+        Returns the worksheet of a generator, reloading the registry once if the tab is not known yet.
+        API CALLS: 0-1
+        """
+
+        if len(self.missing([serial])) > 0:
+            from gspread.exceptions import WorksheetNotFound
+            raise WorksheetNotFound(serial)
+
+        return self.by_serial[serial]
+
+    def missing(self, serials: list[str]) -> list[str]:
+        """
+        Returns the serials without a tab, reloading the registry once if any of them is not known yet.
+        API CALLS: 0-1
+        """
+
+        if any(serial not in self.by_serial for serial in serials):
+            self.refresh()
+
+        return [serial for serial in serials if serial not in self.by_serial]
+
+    def gid(self, serial: str) -> int:
+
+        return self.worksheet(serial).id
+
+    def serial(self, gid: int | str) -> str:
+
+        return self.by_gid[int(gid)].title
+
+registries = {} # spreadsheet id -> Registry, shared by every session
+registries_lock = threading.Lock()
+
+def get_registry(spreadsheet: 'gspread.spreadsheet.Spreadsheet') -> Registry:
+
+    with registries_lock:
+        # worksheets keep a reference to the client that loaded them, so reload them for a new handle
+        if spreadsheet.id not in registries or registries[spreadsheet.id].spreadsheet is not spreadsheet:
+            registries[spreadsheet.id] = Registry(spreadsheet)
+
+        return registries[spreadsheet.id]
@@ -0,0 +1,132 @@
+import threading
+import time
+import uuid
+import gspread
+from datetime import date
+from executor import chunk, is_auth_error, run_parallel
+from journal import get_journal, run_id
+from sheet import reconnect
+from writequeue import autofill_batch
+
+JOB_MAX_AGE = 3600 # seconds a finished job is kept for sessions to see how it went
+
+class Job:
+    """
+    An autofill running in a background thread, shared by every session so that a reloaded page can find it by id.
+    The status of every generator is 'pending' until its batch is done, then 'updated' or 'failed'.
+    """
+
+    def __init__(self, sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], name: str, end_date: date, end_val: float | None, seed: int | None):
+
+        self.id = uuid.uuid4().hex[:12]
+        self.sheet = sheet
+        self.gens = list(gens)
+        self.name = name
+        self.end_date = end_date
+        self.end_val = end_val
+        self.seed = seed
+        self.status = {gen: 'pending' for gen in gens}
+        self.errors = {}
+        self.resumed = 0 # generators already updated by an earlier attempt
+        self.started = time.time()
+        self.finished = None
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.work, daemon=True)
+
+    def work(self):
+
+        error = None
+
+        def update(jobs: list[str]):
+            return autofill_batch(self.sheet, jobs, self.name, self.end_date, self.end_val, self.seed, run)
+
+        try:
+            # retrying an autofill of the same generators with the same options skips the sheets it already updated (see journal.py)
+            run = run_id(self.sheet, self.gens, self.name, self.end_date, self.end_val)
+            resumed = len(set(get_journal(self.sheet).committed(run)) & set(self.gens))
+
+            with self.lock:
+                self.resumed = resumed
+
+            # each batch reads and writes a few generators at once, several batches run in parallel
+            for jobs, results, error in run_parallel(update, chunk(self.gens)):
+
+                if error is not None:
+                    results = {gen: error for gen in jobs}
+
+                if any(e is not None and is_auth_error(e) for e in results.values()):
+                    reconnect(self.sheet) # the next autofill authenticates again
+
+                with self.lock:
+                    for gen, e in results.items():
+                        self.status[gen] = 'updated' if e is None else 'failed'
+                        if e is not None:
+                            self.errors[gen] = str(e)
+                            print(f"Error updating log for {gen}: {e}") # debug text
+
+            if len(self.errors) == 0:
+                get_journal(self.sheet).finish(run)
+
+        except Exception as e: # e.g. no spreadsheet handle, or the journal cannot be opened
+            error = e
+            print(f"Error running autofill job {self.id}: {e}") # debug text
+
+        finally:
+            with self.lock:
+                # sessions polling the job must see it end, whatever stopped it
+                for gen, status in self.status.items():
+                    if status == 'pending':
+                        self.status[gen] = 'failed'
+                        self.errors[gen] = "Autofill stopped before updating this sheet" if error is None else str(error)
+
+                self.finished = time.time()
+
+            print(f"Autofill job {self.id} updated {self.count('updated')} sheets, could not update {self.count('failed')} sheets.") # debug text
+
+    def count(self, status: str) -> int:
+
+        return sum(s == status for s in self.status.values())
+
+    def done(self) -> bool:
+
+        return self.finished is not None
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of the job's progress, safe to read while the job keeps running.
+        """
+
+        with self.lock:
+            return {
+                'status': dict(self.status),
+                'errors': dict(self.errors),
+                'resumed': self.resumed,
+                'started': self.started,
+                'finished': self.finished,
+            }
+
+jobs = {} # job id -> Job
+jobs_lock = threading.Lock()
+
+def start_job(sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], name: str="", end_date: date=date.today(), end_val: float | None = None, seed: int | None = None) -> Job:
+    """
+    Starts autofilling gens in the background and returns the job, which can be found again with get_job.
+    """
+
+    job = Job(sheet, gens, name, end_date, end_val, seed)
+
+    with jobs_lock:
+        # forget jobs that finished long ago
+        for id in [id for id, old in jobs.items() if old.done() and time.time() - old.finished > JOB_MAX_AGE]:
+            del jobs[id]
+
+        jobs[job.id] = job
+
+    job.thread.start()
+
+    return job
+
+def get_job(id: str) -> Job | None:
+
+    with jobs_lock:
+        return jobs.get(id)
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import gspread
+from datetime import date
+from gspread.utils import a1_to_rowcol
+
+JOURNAL_DIR = os.environ.get('GENLOG_JOURNAL_DIR', tempfile.gettempdir()) # set to ':memory:' to keep the journal in memory
+JOURNAL_VERSION = 1     # bumped whenever the tables change, older journals are dropped
+JOURNAL_MAX_AGE = 86400 # seconds before an unfinished run is forgotten
+
+def run_id(sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], name: str, end_date: date, end_val: float | None) -> str:
+    """
+    Returns the id of an autofill run, the same for every retry of an autofill of the same generators with the same options.
+    """
+
+    key = json.dumps([sheet.id, sorted(gens), name, end_date.isoformat(), end_val])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+def update_rows(update: dict) -> tuple[int, int]:
+    """
+    Returns the first and last row of a value range returned by Sheet.autofill.
+    """
+
+    start, _, end = update['range'].split('!')[-1].partition(':')
+    return (a1_to_rowcol(start)[0], a1_to_rowcol(end or start)[0])
+
+class Journal:
+    """
+    Local SQLite record of the autofill runs that have not finished, so that a failed run can be retried.
+
+    For every generator of a run it keeps the rows planned for it and whether they were written: 'planned' once
+    the rows are planned, 'committed' once they are written (or there was nothing to write) and 'failed' if the
+    write failed. A retry skips committed generators whose tab still ends at the last row written, and writes the
+    planned rows of the others again, but only onto a tab that still ends where it did when the rows were planned.
+    Any other tab is planned again.
+    """
+
+    def __init__(self, path: str):
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+        with self.lock, self.conn:
+
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] != JOURNAL_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS entries")
+                self.conn.execute(f"PRAGMA user_version = {JOURNAL_VERSION}")
+
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (run TEXT, gen TEXT, status TEXT, update_json TEXT, "
+                "first_row INTEGER, last_row INTEGER, error TEXT, updated REAL, PRIMARY KEY (run, gen))"
+            )
+            self.conn.execute("DELETE FROM entries WHERE updated < ?", (time.time() - JOURNAL_MAX_AGE,))
+
+    def entries(self, run: str, gens: list[str] | None = None) -> dict[str, dict]:
+        """
+        Returns the journal entry of every generator of a run, or only of those in gens.
+        """
+
+        with self.lock:
+            result = self.conn.execute("SELECT gen, status, update_json, first_row, last_row, error FROM entries WHERE run = ?", (run,)).fetchall()
+
+        entries = {}
+        for gen, status, update, first_row, last_row, error in result:
+            if gens is None or gen in gens:
+                entries[gen] = {
+                    'status': status,
+                    'update': None if update is None else json.loads(update),
+                    'first_row': first_row,
+                    'last_row': last_row,
+                    'error': error,
+                }
+
+        return entries
+
+    def committed(self, run: str) -> list[str]:
+
+        return [gen for gen, entry in self.entries(run).items() if entry['status'] == 'committed']
+
+    def plan(self, run: str, gen: str, update: dict | None):
+        """
+        Records the rows planned for a generator, or that it has nothing to write, which commits it right away.
+        """
+
+        first_row, last_row = (None, None) if update is None else update_rows(update)
+
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, NULL, ?)",
+                (run, gen, 'committed' if update is None else 'planned', None if update is None else json.dumps(update), first_row, last_row, time.time()),
+            )
+
+    def set_status(self, run: str, gens: list[str], status: str, error: Exception | None = None):
+
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE entries SET status = ?, error = ?, updated = ? WHERE run = ? AND gen = ?",
+                [(status, None if error is None else str(error), time.time(), run, gen) for gen in gens],
+            )
+
+    def commit(self, run: str, gens: list[str]):
+
+        self.set_status(run, gens, 'committed')
+
+    def fail(self, run: str, gens: list[str], error: Exception):
+
+        self.set_status(run, gens, 'failed', error)
+
+    def finish(self, run: str):
+        """
+        Forgets a run once every generator in it is committed.
+        """
+
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM entries WHERE run = ?", (run,))
+
+journals = {} # spreadsheet id -> Journal
+journals_lock = threading.Lock()
+
+def get_journal(sheet: gspread.spreadsheet.Spreadsheet) -> Journal:
+
+    with journals_lock:
+        if sheet.id not in journals:
+            path = ':memory:' if JOURNAL_DIR == ':memory:' else os.path.join(JOURNAL_DIR, f"tcc-genlog-journal-{sheet.id}.sqlite3")
+            journals[sheet.id] = Journal(path)
+
+        return journals[sheet.id]
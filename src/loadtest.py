@@ -0,0 +1,299 @@
+"""
+Load tests the app against the in-memory fake spreadsheet (see fake.py) with many simulated sessions at once.
+
+Nothing is drawn: every session keeps what its browser tab would have selected, and each action replays the
+requests of the reruns it causes (see rerun), through the same functions as app.py: app.view_df as load_sheet
+reads the log being viewed, and autofill goes through the confirm dialog's checks and preview, start_job and
+polling the job every second like the progress fragment. Other people can also type rows into the sheets
+directly, which autofill must never write over.
+
+Reports the p50/p95/p99 latency of every action, the API calls per session, the rate of 429 responses,
+duplicated entries and edits written over:
+    python loadtest.py [--sessions N] [--actions N] [--autofill RATIO] [--edits RATIO] [--latency SECONDS] [--drive-lag SECONDS] [--json]
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+import numpy as np
+import cache
+import executor
+import journal
+import mirror
+import telemetry
+from app import view_df
+from executor import RateLimiter
+from fake import fake_spreadsheet
+from generators import generators, get_registry
+from jobs import get_job, start_job
+from sheet import fleet_status, preview
+from utility import parse_numbers, DATE_COL, READING_COL
+from validate import validate
+
+ACTIONS = ('view', 'older', 'range', 'fleet') # besides autofill and edits, picked with equal odds
+HISTORY_WEEKS = 104 # weeks of logs already in every sheet
+BEHIND_WEEKS = 4    # weeks every log is behind today, for autofill to fill
+POLL_INTERVAL = 1.0 # seconds between polls of an autofill job, like autofill_progress
+EDITED = "EDITED IN SHEETS" # location of the rows typed into the sheets directly
+
+class Session:
+    """
+    What one browser tab of the app has selected, as kept in its session state and URL.
+    """
+
+    def __init__(self, id: int):
+
+        self.id = id
+        self.gen = None     # selected_gen
+        self.pages = {}     # pages
+        self.dates = ()     # view_dates
+        self.fleet = False  # Fleet overview toggle
+        self.more = False   # whether Load older rows is shown
+        self.job = None     # job query parameter
+
+def rerun(session: Session, sheet):
+    """
+    Makes the requests of one rerun of app.main() for the session: the fleet overview if it is on,
+    the log being viewed with its Open Sheet link, and the progress of its autofill job.
+    """
+
+    gens = list(generators.values())
+
+    if session.fleet:
+        fleet_status(sheet, gens)
+
+    if session.gen is not None:
+        _, session.more = view_df(sheet, session.gen, session.pages.get(session.gen, 1), session.dates)
+        get_registry(sheet).gid(session.gen)
+
+    if session.job is not None:
+        get_job(session.job).snapshot()
+
+def autofill(session: Session, sheet, rng: random.Random, args: argparse.Namespace):
+    """
+    Autofills a few generators like a user would: opens the confirm dialog, maybe previews the changes, confirms,
+    and waits for the job to finish. Raises the first error of the job.
+    """
+
+    selected = rng.sample(list(generators.values()), rng.randint(1, args.autofill_gens))
+    seed = rng.getrandbits(32)
+
+    rerun(session, sheet) # Autofill Logsheets opens the dialog, which checks the logs
+    validate(sheet, selected)
+
+    if rng.random() < 0.5: # Preview changes, a rerun of the dialog
+        validate(sheet, selected)
+        preview(sheet, selected, date.today(), None, seed)
+
+    validate(sheet, selected) # Yes
+    job = start_job(sheet, selected, f"session {session.id}", date.today(), None, seed)
+    session.job = job.id
+    rerun(session, sheet)
+
+    while not job.done():
+        time.sleep(POLL_INTERVAL)
+        job.snapshot()
+
+    session.job = None # Done
+    rerun(session, sheet)
+
+    errors = job.snapshot()['errors']
+    if len(errors) > 0:
+        raise ValueError(next(iter(errors.values())))
+
+def edit(sheet, rng: random.Random) -> bool:
+    """
+    Types a row into a random sheet directly, the way someone using the sheet would, under its last reading.
+    Returns False if the sheet has no reading to continue from.
+    """
+
+    gen = rng.choice(list(generators.values()))
+    rows = sheet.tab(gen).cells({})
+    readings = parse_numbers([row[READING_COL - 1] if len(row) >= READING_COL else '' for row in rows]).dropna()
+
+    if len(readings) == 0:
+        return False
+
+    sheet.edit(gen, [rows[readings.index[-1]][DATE_COL - 1], EDITED, "EAS", "", "", "", "0.5", f"{readings.iloc[-1] + 0.5:g}"])
+    return True
+
+def session(id: int, sheet, args: argparse.Namespace, timings: dict, failures: dict, edits: list, lock: threading.Lock):
+    """
+    Runs the actions of one simulated session, recording how long each took and whether it failed.
+    """
+
+    rng = random.Random(args.seed + id)
+    gens = list(generators.values())
+    state = Session(id)
+
+    rerun(state, sheet) # the page is opened
+
+    for _ in range(args.actions):
+
+        time.sleep(rng.uniform(0, args.think))
+
+        draw = rng.random()
+        action = 'autofill' if draw < args.autofill else 'edit' if draw < args.autofill + args.edits else rng.choice(ACTIONS)
+        start = time.perf_counter()
+
+        try:
+            if action == 'view': # a new generator picked in the viewer
+                state.gen = rng.choice(gens)
+                state.dates = ()
+                rerun(state, sheet)
+
+            elif action == 'older':
+                if state.gen is None or not state.more:
+                    continue
+                state.pages[state.gen] = state.pages.get(state.gen, 1) + 1
+                rerun(state, sheet) # Load older rows
+                rerun(state, sheet) # st.rerun()
+
+            elif action == 'range':
+                if state.gen is None:
+                    continue
+                end_date = date.today() - timedelta(days=7 * rng.randrange(0, HISTORY_WEEKS))
+                state.dates = (end_date - timedelta(days=60), end_date)
+                rerun(state, sheet)
+
+            elif action == 'fleet':
+                state.fleet = not state.fleet
+                rerun(state, sheet)
+
+            elif action == 'edit':
+                if not edit(sheet, rng):
+                    continue
+                with lock:
+                    edits.append(1)
+
+            else:
+                autofill(state, sheet, rng, args)
+
+        except Exception as e:
+            with lock:
+                failures[action] += 1
+            print(f"Session {id} {action} failed: {e}") # debug text
+
+        with lock:
+            timings[action].append(time.perf_counter() - start)
+
+def conflicts(sheet) -> int:
+    """
+    Returns the number of EAS entries written more than once for the same date, e.g. by two sessions
+    autofilling the same generator from the same last row.
+    """
+
+    count = 0
+    for tab in sheet.tabs.values():
+        dates = [row[0] for row in tab.rows if len(row) > 2 and row[1] != EDITED and row[2] == "EAS"]
+        count += len(dates) - len(set(dates))
+
+    return count
+
+def kept_edits(sheet) -> int:
+    """
+    Returns the number of rows typed into the sheets directly that are still there.
+    """
+
+    return sum(len(row) > 1 and row[1] == EDITED for tab in sheet.tabs.values() for row in tab.rows)
+
+def run(args: argparse.Namespace) -> dict:
+
+    gens = list(generators.values())
+    sheet = fake_spreadsheet(
+        gens, HISTORY_WEEKS, date.today() - timedelta(days=7 * BEHIND_WEEKS),
+        latency=args.latency, jitter=args.jitter, drive_lag=args.drive_lag,
+        read_quota=args.read_quota, write_quota=args.write_quota, quota_period=args.quota_period,
+    )
+
+    # the app's own limiters enforce the same quotas as the fake spreadsheet
+    executor.limiters.update({
+        'read': RateLimiter(args.read_quota, args.quota_period),
+        'write': RateLimiter(args.write_quota, args.quota_period),
+    })
+    cache.df_cache.clear()
+
+    timings = defaultdict(list)
+    failures = defaultdict(int)
+    edits = []
+    lock = threading.Lock()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i, sheet, args, timings, failures, edits, lock)) for i in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+
+    calls = sum(sheet.stats['calls'].values())
+
+    return {
+        'sessions': args.sessions,
+        'wall': round(wall, 3),
+        'calls': calls,
+        'calls_per_session': round(calls / args.sessions, 2),
+        'quota_errors': sheet.stats['quota_errors'],
+        'quota_error_rate': round(sheet.stats['quota_errors'] / max(calls, 1), 4),
+        'conflicting_entries': conflicts(sheet),
+        'overwritten_edits': len(edits) - kept_edits(sheet),
+        'actions': {
+            action: {
+                'count': len(seconds),
+                'failed': failures[action],
+                **{f"p{q}": round(float(np.percentile(seconds, q)), 4) for q in (50, 95, 99)},
+            }
+            for action, seconds in sorted(timings.items())
+        },
+    }
+
+def report(results: dict):
+
+    print(f"{'action':<10} {'count':>6} {'failed':>7} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for action, stats in results['actions'].items():
+        print(f"{action:<10} {stats['count']:>6} {stats['failed']:>7} {stats['p50']:>8.3f}s {stats['p95']:>8.3f}s {stats['p99']:>8.3f}s")
+
+    print(f"{results['sessions']} sessions in {results['wall']:.1f}s, {results['calls']} API calls ({results['calls_per_session']} per session), "
+          f"{results['quota_errors']} quota errors ({results['quota_error_rate']:.1%}), {results['conflicting_entries']} conflicting entries, "
+          f"{results['overwritten_edits']} edits written over")
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Load test the app with many sessions against a fake spreadsheet")
+    parser.add_argument('--sessions', type=int, default=20, help="sessions running at once (default 20)")
+    parser.add_argument('--actions', type=int, default=10, help="actions per session (default 10)")
+    parser.add_argument('--autofill', type=float, default=0.1, help="share of actions that autofill (default 0.1)")
+    parser.add_argument('--autofill-gens', type=int, default=5, help="most generators autofilled at once (default 5)")
+    parser.add_argument('--edits', type=float, default=0.05, help="share of actions that type a row into a sheet directly (default 0.05)")
+    parser.add_argument('--think', type=float, default=0.5, help="most seconds a session waits between actions (default 0.5)")
+    parser.add_argument('--latency', type=float, default=0.1, help="seconds added to every API call (default 0.1)")
+    parser.add_argument('--jitter', type=float, default=0.05, help="most random seconds added on top of latency (default 0.05)")
+    parser.add_argument('--drive-lag', type=float, default=5.0, help="seconds before Drive reports a change to the spreadsheet (default 5)")
+    parser.add_argument('--read-quota', type=int, default=executor.READ_QUOTA, help=f"read requests per quota period (default {executor.READ_QUOTA})")
+    parser.add_argument('--write-quota', type=int, default=executor.WRITE_QUOTA, help=f"write requests per quota period (default {executor.WRITE_QUOTA})")
+    parser.add_argument('--quota-period', type=float, default=60.0, help="seconds of a quota period (default 60)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the sessions' choices (default 0)")
+    parser.add_argument('--json', action='store_true', help="print the results as JSON, e.g. to keep as a baseline")
+    args = parser.parse_args()
+
+    mirror.MIRROR_DIR = ':memory:' # every fake spreadsheet gets its own empty mirror
+    journal.JOURNAL_DIR = ':memory:'
+    telemetry.logger.setLevel(logging.WARNING) # no log line for every call
+
+    with contextlib.redirect_stdout(sys.stderr): # keep stdout for the results
+        results = run(args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import gspread
+import pandas as pd
+from gspread.utils import absolute_range_name, rowcol_to_a1
+from executor import call
+from utility import parse_dates, parse_numbers, DATE_COL, ENTRY_COL, READING_COL, NUM_COLS
+
+MIRROR_DIR = os.environ.get('GENLOG_MIRROR_DIR', tempfile.gettempdir()) # set to ':memory:' to keep the mirror in memory
+MIRROR_VERSION = 4      # bumped whenever the tables change, older mirrors are dropped
+SYNC_WINDOW = 500       # rows fetched per tab per request, tabs with more new rows are fetched again
+RESYNC_AGE = 3600       # seconds before a tab is mirrored again from scratch, to pick up edits to older rows
+HEADER_ROW = 1
+
+# index column -> row flag it points to the last row of
+INDEX = {
+    'last_dated_row': 'dated',          # last row with anything in the date column, i.e. len(col_values(DATE_COL))
+    'last_date_row': 'is_date',         # last row with a valid date
+    'last_reading_row': 'is_reading',   # last row with a valid reading
+    'last_pol_row': 'is_top_up',        # last POL top up
+}
+
+class Mirror:
+    """
+    Local SQLite copy of the generator logs. For each tab it holds the header row and a window of rows from lo
+    to synced, which is either the whole log or only its last rows (see sync).
+
+    A sync fetches nothing if the spreadsheet's Drive modifiedTime is the same as when the tab was last synced.
+    Otherwise it fetches the tab again from the earliest row autofill depends on (see start), so that rows appended
+    and rows edited since are both seen. Edits to older rows are picked up once the tab is RESYNC_AGE seconds old
+    and mirrored again from scratch. Each tab also keeps an index
+    of the last dated row, the last valid date and reading and the last POL top up, so that the state autofill
+    starts from is found without going through the whole log. An index entry is NULL if the row is not in the
+    window, and 0 if the whole log is mirrored and has no such row.
+    """
+
+    def __init__(self, path: str):
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+        with self.lock, self.conn:
+
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] != MIRROR_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS rows")
+                self.conn.execute("DROP TABLE IF EXISTS tabs")
+                self.conn.execute(f"PRAGMA user_version = {MIRROR_VERSION}")
+
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows (gen TEXT, row INTEGER, cells TEXT, "
+                "dated INTEGER, is_date INTEGER, is_reading INTEGER, is_top_up INTEGER, PRIMARY KEY (gen, row))"
+            )
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS tabs (gen TEXT PRIMARY KEY, lo INTEGER, synced INTEGER, modified TEXT, fetched REAL, {', '.join(f'{column} INTEGER' for column in INDEX)})")
+
+            for flag in INDEX.values():
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS rows_{flag} ON rows (gen, {flag}, row)")
+
+    def tab(self, gen: str) -> dict | None:
+        """
+        Returns the window (lo, synced), the modifiedTime it was synced at, when it was first fetched and the index of a tab,
+        or None if it is not mirrored yet.
+        """
+
+        with self.lock:
+            result = self.conn.execute(f"SELECT lo, synced, modified, fetched, {', '.join(INDEX)} FROM tabs WHERE gen = ?", (gen,)).fetchone()
+
+        if result is None:
+            return None
+
+        return dict(zip(('lo', 'synced', 'modified', 'fetched', *INDEX), result))
+
+    def complete(self, gen: str) -> bool:
+        """
+        Returns True if every index entry of a tab is known, so that autofill can start from its window.
+        """
+
+        tab = self.tab(gen)
+        return tab is not None and all(tab[column] is not None for column in INDEX)
+
+    def start(self, gen: str) -> int:
+        """
+        Returns the first row autofill needs to read: the earliest row the index points to.
+        """
+
+        tab = self.tab(gen)
+        return min([tab[column] for column in INDEX if tab[column]], default=tab['lo'])
+
+    def store(self, gen: str, first_row: int, values: list[list[str]]):
+        """
+        Saves fetched rows starting from first_row, flagging them for the index. Called with the lock held.
+        """
+
+        if len(values) == 0:
+            return
+
+        def cells(col: int) -> list[str]:
+            return [row[col - 1] if len(row) >= col else '' for row in values]
+
+        dates = cells(DATE_COL)
+        flags = pd.DataFrame({
+            'dated': [date != '' for date in dates],
+            'is_date': parse_dates(dates).notna(),
+            'is_reading': parse_numbers(cells(READING_COL)).notna(),
+            'is_top_up': [entry == "TOP UP POL" for entry in cells(ENTRY_COL)],
+        }).astype(int)
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(gen, first_row + i, json.dumps(row), *flags.iloc[i].tolist()) for i, row in enumerate(values)],
+        )
+
+    def reindex(self, gen: str):
+        """
+        Points every index entry of a tab at the last flagged row in its window. Called with the lock held.
+        """
+
+        lo = self.conn.execute("SELECT lo FROM tabs WHERE gen = ?", (gen,)).fetchone()[0]
+
+        for column, flag in INDEX.items():
+            row = self.conn.execute(f"SELECT MAX(row) FROM rows WHERE gen = ? AND {flag} = 1", (gen,)).fetchone()[0]
+            if row is None and lo <= HEADER_ROW + 1:
+                row = 0 # the whole log is mirrored, so there is no such row
+
+            self.conn.execute(f"UPDATE tabs SET {column} = ? WHERE gen = ?", (row, gen))
+
+    def fetch(self, sheet: gspread.spreadsheet.Spreadsheet, starts: dict[str, int], headers: list[str] = [], modified: str | None = None):
+        """
+        Fetches every row of each tab from its start row onwards, SYNC_WINDOW rows at a time, replacing the mirrored rows
+        from there, along with the header rows of headers. The tabs are marked as synced at modified (see last_modified).
+        The API leaves out trailing empty rows, so a window that comes back short does not mean the tab ends there:
+        the first request also reads the date column from the start row to the end, and windows are fetched
+        until they are past the last dated row.
+        API CALLS: 1 (more if a tab has over SYNC_WINDOW rows to fetch)
+        """
+
+        label = rowcol_to_a1(1, DATE_COL)[:-1]
+        pending = dict(starts)
+        ends = {} # tab -> last dated row
+        first = True # rows past the end of a tab are only forgotten with its first window
+
+        while len(pending) > 0:
+
+            ranges = [
+                absolute_range_name(gen, f"{rowcol_to_a1(start, 1)}:{rowcol_to_a1(start + SYNC_WINDOW - 1, NUM_COLS)}")
+                for gen, start in pending.items()
+            ]
+            if first:
+                ranges += [absolute_range_name(gen, f"{rowcol_to_a1(start, DATE_COL)}:{label}") for gen, start in pending.items()]
+            ranges += [absolute_range_name(gen, f"{rowcol_to_a1(HEADER_ROW, 1)}:{rowcol_to_a1(HEADER_ROW, NUM_COLS)}") for gen in headers]
+
+            value_ranges = call('read', sheet.values_batch_get, ranges, gens=list(pending)).get('valueRanges', [])
+            fetched = {}
+
+            if first:
+                for (gen, start), value_range in zip(pending.items(), value_ranges[len(pending):]):
+                    ends[gen] = start - 1 + len(value_range.get('values', []))
+                value_ranges = value_ranges[:len(pending)] + value_ranges[2 * len(pending):]
+
+            with self.lock, self.conn:
+
+                for gen, value_range in zip(headers, value_ranges[len(pending):]):
+                    self.store(gen, HEADER_ROW, value_range.get('values', []))
+
+                for (gen, start), value_range in zip(pending.items(), value_ranges):
+
+                    values = value_range.get('values', [])
+                    if first: # e.g. rows cleared since the last sync
+                        self.conn.execute("DELETE FROM rows WHERE gen = ? AND row >= ?", (gen, start))
+                    self.store(gen, start, values)
+
+                    self.conn.execute("INSERT OR IGNORE INTO tabs (gen, lo, synced, fetched) VALUES (?, ?, 0, ?)", (gen, start, time.time()))
+                    self.conn.execute("UPDATE tabs SET synced = ?, modified = ? WHERE gen = ?", (start - 1 + len(values), modified, gen))
+                    self.reindex(gen)
+
+                    fetched[gen] = len(values)
+
+            # a short window may only have empty rows at its end, e.g. a blank row before the log goes on
+            pending = {gen: pending[gen] + SYNC_WINDOW for gen in fetched if fetched[gen] == SYNC_WINDOW or ends[gen] >= pending[gen] + SYNC_WINDOW}
+            headers = []
+            first = False
+
+    def lengths(self, sheet: gspread.spreadsheet.Spreadsheet, gens: list[str]) -> dict[str, int]:
+        """
+        Returns the number of rows of every tab, going by its date column.
+        API CALLS: 1
+        """
+
+        label = rowcol_to_a1(1, DATE_COL)[:-1]
+        ranges = [absolute_range_name(gen, f"{label}:{label}") for gen in gens]
+        value_ranges = call('read', sheet.values_batch_get, ranges, params={'majorDimension': 'COLUMNS'}, gens=gens).get('valueRanges', [])
+
+        return {gen: len(value_range.get('values', [[]])[0]) for gen, value_range in zip(gens, value_ranges)}
+
+    def last_modified(self, sheet: gspread.spreadsheet.Spreadsheet) -> str | None:
+        """
+        Returns the Drive modifiedTime of the spreadsheet, or None if it cannot be read, so that every tab is fetched.
+        API CALLS: 1 (Drive API)
+        """
+
+        try:
+            return call('drive', sheet.get_lastUpdateTime)
+        except Exception as e:
+            print(f"Error checking if the spreadsheet changed: {e}") # debug text
+            return None
+
+    def sync(self, sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], strict: bool = True, tail: int | None = None, force: bool = False):
+        """
+        Fetches the rows of every tab in gens from the earliest row autofill depends on (see start), in one request for all tabs,
+        so that rows appended or edited since the last sync are seen. Tabs synced since the spreadsheet was last modified
+        are not fetched, which takes one Drive request to check, unless force is True: Drive may report an edit late,
+        so a tab about to be written to is always fetched.
+        A tab that is not mirrored yet, or was first fetched over RESYNC_AGE seconds ago, is fetched whole,
+        or if tail is given, only its header and last tail rows, which takes one more request to find where each tab ends.
+        If strict is False, a failed request is only logged and the rows already mirrored are used.
+        API CALLS: 1-3 (0-2 Sheets API, more if a tab has over SYNC_WINDOW rows to fetch)
+        """
+
+        if len(gens) == 0:
+            return
+
+        modified = self.last_modified(sheet) # read before the rows, so that a change while fetching is seen next time
+        tabs = {gen: self.tab(gen) for gen in gens}
+
+        for gen, tab in tabs.items():
+            if tab is not None and (tab['fetched'] or 0) < time.time() - RESYNC_AGE:
+                self.drop(gen) # edits to rows before start are only seen by mirroring the tab again
+                tabs[gen] = None
+
+        cold = [gen for gen, tab in tabs.items() if tab is None]
+        starts = {
+            gen: min(self.start(gen), tab['synced'] + 1) for gen, tab in tabs.items()
+            if tab is not None and (force or modified is None or tab['modified'] != modified)
+        }
+
+        if len(starts) + len(cold) == 0:
+            return
+
+        try:
+            if tail is None:
+                starts.update({gen: 1 for gen in cold})
+
+            elif len(cold) > 0:
+                lengths = self.lengths(sheet, cold)
+                starts.update({gen: max(HEADER_ROW + 1, lengths[gen] - tail + 1) for gen in cold})
+
+            self.fetch(sheet, starts, [gen for gen in cold if starts[gen] > HEADER_ROW], modified)
+
+        except Exception as e:
+            if strict:
+                raise
+            print(f"Error syncing {', '.join(gens)}, using mirrored rows: {e}") # debug text
+
+    def extend(self, sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], rows: int | None = None, strict: bool = True):
+        """
+        Widens the window of every tab in gens back by rows rows, or back to the start of the log if rows is None,
+        in one request for all tabs.
+        API CALLS: 0-1
+        """
+
+        ranges = {}
+        for gen in gens:
+            tab = self.tab(gen)
+            if tab is not None and tab['lo'] > HEADER_ROW + 1:
+                lo = tab['lo']
+                start = HEADER_ROW + 1 if rows is None else max(HEADER_ROW + 1, lo - rows)
+                ranges[gen] = (start, lo - 1)
+
+        if len(ranges) == 0:
+            return
+
+        try:
+            value_ranges = call('read', sheet.values_batch_get, [
+                absolute_range_name(gen, f"{rowcol_to_a1(start, 1)}:{rowcol_to_a1(end, NUM_COLS)}")
+                for gen, (start, end) in ranges.items()
+            ], gens=list(ranges)).get('valueRanges', [])
+
+        except Exception as e:
+            if strict:
+                raise
+            print(f"Error loading older rows of {', '.join(ranges)}: {e}") # debug text
+            return
+
+        with self.lock, self.conn:
+            for (gen, (start, _)), value_range in zip(ranges.items(), value_ranges):
+                self.store(gen, start, value_range.get('values', []))
+                self.conn.execute("UPDATE tabs SET lo = ? WHERE gen = ?", (start, gen))
+                self.reindex(gen)
+
+    def truncate(self, gen: str, row: int):
+        """
+        Forgets the rows of a tab from row onwards, so that the next sync fetches them again and the index is
+        brought up to date with them. Called after those rows are written to.
+        """
+
+        tab = self.tab(gen)
+        if tab is None:
+            return
+
+        if row <= tab['lo']: # nothing of the window is left, so mirror the tab again
+            self.drop(gen)
+            return
+
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM rows WHERE gen = ? AND row >= ?", (gen, row))
+            # modified is cleared too, as Drive may not have seen the write yet
+            self.conn.execute("UPDATE tabs SET synced = MIN(synced, ?), modified = NULL WHERE gen = ?", (row - 1, gen))
+            self.reindex(gen)
+
+    def drop(self, gen: str):
+        """
+        Forgets a tab, so that the next sync mirrors it from scratch.
+        """
+
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM rows WHERE gen = ?", (gen,))
+            self.conn.execute("DELETE FROM tabs WHERE gen = ?", (gen,))
+
+    def rows(self, gen: str, start: int = 1, end: int | None = None) -> list[list[str]]:
+        """
+        Returns the mirrored rows of a tab from start onwards (up to end), with empty or unmirrored rows as empty lists.
+        """
+
+        with self.lock:
+            result = self.conn.execute(
+                "SELECT row, cells FROM rows WHERE gen = ? AND row >= ? AND row <= ? ORDER BY row",
+                (gen, start, end if end is not None else 2 ** 62),
+            ).fetchall()
+
+        rows = [[] for _ in range(result[-1][0] - start + 1 if len(result) > 0 else 0)]
+        for row, cells in result:
+            rows[row - start] = json.loads(cells)
+
+        return rows
+
+    def columns(self, gen: str, cols: dict[str, int], start: int = 1) -> dict[str, list[str]]:
+        """
+        Returns the mirrored values of each column in cols (key -> column number) from start onwards,
+        like Worksheet.col_values without trailing empty cells.
+        """
+
+        rows = self.rows(gen, start)
+        data = {}
+
+        for key, col in cols.items():
+            values = [cells[col - 1] if len(cells) >= col else '' for cells in rows]
+
+            while len(values) > 0 and values[-1] == '':
+                values.pop()
+
+            data[key] = values
+
+        return data
+
+mirrors = {} # spreadsheet id -> Mirror
+mirrors_lock = threading.Lock()
+
+def get_mirror(sheet: gspread.spreadsheet.Spreadsheet) -> Mirror:
+
+    with mirrors_lock:
+        if sheet.id not in mirrors:
+            path = ':memory:' if MIRROR_DIR == ':memory:' else os.path.join(MIRROR_DIR, f"tcc-genlog-{sheet.id}.sqlite3")
+            mirrors[sheet.id] = Mirror(path)
+
+        return mirrors[sheet.id]
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from utility import EAS_ENTRY_STD_DEV, DATE_WRITE_FORMAT, DATE_COL, ADDRESS_COL, ENTRY_COL, RUNTIME_COL, READING_COL, FUEL_COL, NAME_COL, NUM_COLS
+
+EAS_INCREMENT = 0.5     # weekly runtime when no final reading is given
+POL_LIMIT = 20.0        # maximum runtime between consecutive POL top ups
+
+def weekly_increments(num_weeks: int, diff: float | None = None, rng: np.random.Generator | None = None) -> np.ndarray:
+    """
+    Returns the runtime of every EAS entry. Without diff every week runs EAS_INCREMENT,
+    otherwise diff is spread randomly over the weeks, rounded to 2 decimal places.
+    """
+
+    if diff is None:
+        return np.full(num_weeks, EAS_INCREMENT)
+
+    if num_weeks == 0:
+        raise ValueError("End date must be at least a week after the last entry to reach the final reading")
+
+    rng = np.random.default_rng() if rng is None else rng
+
+    weekly_average = diff / num_weeks
+    deviations = rng.normal(0, EAS_ENTRY_STD_DEV, num_weeks)
+
+    increments = weekly_average + deviations
+    increments *= diff / increments.sum()
+    increments = np.round(increments, 2)
+    increments[-1] = round(diff - increments[:-1].sum(), 2)
+
+    if increments.min() < 0:
+        raise ValueError("Difference between last reading and target reading too small, good luck bro")
+
+    return increments
+
+def top_up_weeks(increments: np.ndarray, runtime: float = 0.0) -> np.ndarray:
+    """
+    Returns a mask of the weeks after which POL is topped up, i.e. when the runtime since the last top up
+    (starting from runtime) reaches POL_LIMIT. Each top up is found on the cumulative runtime with a binary search.
+    Runtimes are summed in whole hundredths, so a top up never depends on floating point rounding.
+    """
+
+    totals = np.cumsum(np.rint(np.asarray(increments) * 100).astype(np.int64))
+    mask = np.zeros(len(increments), dtype=bool)
+
+    limit = round(POL_LIMIT * 100)
+    threshold = limit - round(runtime * 100)
+    while True:
+        week = np.searchsorted(totals, threshold, side='left')
+        if week >= len(totals):
+            return mask
+
+        mask[week] = True
+        threshold = totals[week] + limit
+
+def plan(latest_date: date, first_row: int, latest_reading: float, runtime: float, increments: np.ndarray) -> pd.DataFrame:
+    """
+    Returns every row autofill writes after latest_date, one week per increment, as columns:
+    row, date, location, entry, runtime and reading, plus fuel for POL top ups.
+    A "BOOK CLOSED" row comes before the first entry of every month, and a POL top up after the week
+    the runtime since the last top up reaches POL_LIMIT.
+    """
+
+    num_weeks = len(increments)
+    dates = np.datetime64(latest_date, 'D') + np.arange(1, num_weeks + 1) * np.timedelta64(7, 'D')
+    previous = dates - np.timedelta64(7, 'D')
+    readings = np.round(np.cumsum(np.concatenate([[latest_reading], increments]))[1:], 2)
+    date_labels = pd.to_datetime(dates).strftime(DATE_WRITE_FORMAT)
+
+    closes = dates.astype('datetime64[M]') != previous.astype('datetime64[M]')
+    top_ups = top_up_weeks(increments, runtime)
+    weeks = np.arange(num_weeks)
+
+    closed_months = pd.to_datetime(previous[closes])
+
+    book = pd.DataFrame({
+        'week': weeks[closes],
+        'order': 0,
+        'location': "BOOK CLOSED FOR " + closed_months.strftime('%b').str.upper() + " " + closed_months.strftime('%Y'),
+    })
+    eas = pd.DataFrame({
+        'week': weeks,
+        'order': 1,
+        'date': date_labels,
+        'location': "JC1",
+        'entry': "EAS",
+        'runtime': increments,
+        'reading': readings,
+    })
+    pol = pd.DataFrame({
+        'week': weeks[top_ups],
+        'order': 2,
+        'date': date_labels[top_ups],
+        'location': "POL RECEIVED FROM TCC",
+        'entry': "TOP UP POL",
+        'reading': readings[top_ups],
+        'fuel': "60l",
+    })
+
+    schedule = pd.concat([book, eas, pol], ignore_index=True).sort_values(['week', 'order'], kind='stable', ignore_index=True)
+    schedule = schedule.reindex(columns=['date', 'location', 'entry', 'runtime', 'reading', 'fuel'])
+    schedule.insert(0, 'row', first_row + np.arange(len(schedule)))
+
+    return schedule
+
+def to_values(schedule: pd.DataFrame, name: str = "") -> list[list]:
+    """
+    Returns the rows of a schedule as cell values for a value range, with unplanned cells as None
+    and trailing empty cells dropped.
+    """
+
+    values = np.full((len(schedule), NUM_COLS), None, dtype=object)
+    columns = {'date': DATE_COL, 'location': ADDRESS_COL, 'entry': ENTRY_COL, 'runtime': RUNTIME_COL, 'reading': READING_COL, 'fuel': FUEL_COL}
+
+    for column, col in columns.items():
+        values[:, col - 1] = schedule[column].astype(object).where(schedule[column].notna(), None).to_numpy()
+
+    values[schedule['entry'].notna().to_numpy(), NAME_COL - 1] = name
+
+    rows = values.tolist()
+    for row in rows:
+        while len(row) > 0 and row[-1] is None:
+            row.pop()
+
+    return rows
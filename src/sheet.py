@@ -1,20 +1,41 @@
+import threading
+import time
+import zlib
 import gspread
-from gspread.cell import Cell
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_to_rowcol, absolute_range_name, fill_gaps, rowcol_to_a1
 from google.oauth2.service_account import Credentials
 from datetime import date, datetime, timedelta
-from utility import isfloat, isdate, format_date, EAS_ENTRY_STD_DEV, DATE_READ_FORMAT, DATE_WRITE_FORMAT, DATE_COL, ADDRESS_COL, ENTRY_COL, RUNTIME_COL, READING_COL, FUEL_COL, NAME_COL
+from cache import get_df, invalidate, FLEET
+from executor import call
+from generators import get_registry, SPREADSHEET_KEY
+from mirror import get_mirror, HEADER_ROW
+from planner import plan, to_values, weekly_increments, POL_LIMIT
+from utility import parse_dates, parse_numbers, last_valid, DATE_READ_FORMAT, DATE_COL, ENTRY_COL, READING_COL, NUM_COLS
 import streamlit as st
 import pandas as pd
 import numpy as np
 
-def authenticate() -> gspread.spreadsheet.Spreadsheet | None:
+HANDLE_MAX_AGE = 3600 # seconds before the shared spreadsheet handle is opened again
+TAIL_ROWS = 100 # rows read from the end of a tab autofill has not read before
+PAGE_ROWS = 200 # rows of a log the viewer loads at a time
+PROBE_ROWS = 20 # dates read at a time when looking for the rows of a date range
+
+shared = {'sheet': None, 'opened': 0.0, 'warming': False} # spreadsheet handle shared by every session in the process
+shared_lock = threading.Lock()
+
+def authenticate(info: dict | None = None) -> gspread.spreadsheet.Spreadsheet | None:
+    """
+    Opens the spreadsheet with the service account info given, or the one in the Streamlit secrets.
+    Returns None if authentication fails.
+    """
 
     SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
 
     try:
-        creds = Credentials.from_service_account_info(st.secrets["gcp_service_account"], scopes=SCOPES)
-        client = gspread.authorize(creds)
-        sheet = client.open('tcc-genlog')
+        creds = Credentials.from_service_account_info(st.secrets["gcp_service_account"] if info is None else info, scopes=SCOPES)
+        client = gspread.authorize(creds)           # the authorized session refreshes its access token by itself
+        sheet = call('read', client.open_by_key, SPREADSHEET_KEY) # no Drive lookup by name
 
         print("Google service account authentication success!")
         return sheet
@@ -23,6 +44,266 @@ def authenticate() -> gspread.spreadsheet.Spreadsheet | None:
         print(f"Error with Google service account authentication: {e}")
         return None
 
+def get_spreadsheet() -> gspread.spreadsheet.Spreadsheet | None:
+    """
+    Returns the spreadsheet handle shared by every session, authenticating on first use, after reconnect(),
+    or once the handle is older than HANDLE_MAX_AGE. Returns None if authentication fails.
+    API CALLS: 0-1
+    """
+
+    with shared_lock:
+
+        if shared['sheet'] is None or time.monotonic() - shared['opened'] > HANDLE_MAX_AGE:
+
+            sheet = authenticate()
+
+            if sheet is not None:
+                shared['sheet'] = sheet
+                shared['opened'] = time.monotonic()
+
+        return shared['sheet']
+
+def reconnect(sheet: gspread.spreadsheet.Spreadsheet | None):
+    """
+    Drops the shared handle if it is still sheet, so that the next get_spreadsheet() authenticates again.
+    """
+
+    with shared_lock:
+        if shared['sheet'] is sheet:
+            shared['sheet'] = None
+
+def warm_up():
+    """
+    Authenticates and loads the registry in a background thread, so that the page can be drawn without waiting.
+    """
+
+    def run():
+        try:
+            sheet = get_spreadsheet()
+            if sheet is not None:
+                get_registry(sheet)
+
+        except Exception as e:
+            print(f"Error warming up: {e}")
+
+        finally:
+            shared['warming'] = False
+
+    with shared_lock:
+        if shared['sheet'] is not None or shared['warming']:
+            return
+        shared['warming'] = True
+
+    threading.Thread(target=run, daemon=True).start()
+
+def batch_read(sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], force: bool = False) -> dict[str, dict[str, list[str]]]:
+    """
+    Reads the date, entry and reading columns every generator's autofill needs from the local mirror, after syncing them in a single request.
+    Only the rows from the earliest row in the mirror's index (see Mirror) are returned, with the first row number as 'start'.
+    Tabs not mirrored yet are read from their last TAIL_ROWS rows, widened only while their index is incomplete.
+    If force is True, the tabs are fetched even if Drive reports no change since the last read (see Mirror.sync).
+    Returns a dict mapping each generator to its columns, in the format used by Sheet.data. Generators without a tab
+    are left out (see tab_data), as the API fails the whole request if one of its ranges is on a missing tab.
+    API CALLS: 1-2, one of them to the Drive API, 2 if force is True (3 or more for tabs not mirrored yet or not in the registry)
+    """
+
+    if len(gens) == 0:
+        return {}
+
+    registry = get_registry(sheet)
+    mirror = get_mirror(sheet)
+
+    for attempt in range(2):
+        missing = registry.missing(gens)
+        gens = [gen for gen in gens if gen not in missing]
+
+        try:
+            mirror.sync(sheet, gens, tail=TAIL_ROWS, force=force) # only fetches the rows autofill starts from
+            break
+
+        except APIError as e:
+            if attempt > 0 or e.response.status_code != 400:
+                raise
+            registry.refresh() # e.g. a tab renamed since the registry was loaded, so its range cannot be parsed
+
+    rows = TAIL_ROWS
+    incomplete = [gen for gen in gens if not mirror.complete(gen)]
+
+    while len(incomplete) > 0: # e.g. the last POL top up is older than the rows mirrored
+        mirror.extend(sheet, incomplete, rows)
+        rows *= 2
+        incomplete = [gen for gen in incomplete if not mirror.complete(gen)]
+
+    cols = {'dates': DATE_COL, 'entries': ENTRY_COL, 'readings': READING_COL}
+    data = {}
+
+    for gen in gens:
+        start = mirror.start(gen)
+        data[gen] = {**mirror.columns(gen, cols, start), 'start': start}
+
+    return data
+
+def tab_data(data: dict[str, dict[str, list[str]]], gen: str) -> dict[str, list[str]]:
+    """
+    Returns the columns of a generator read by batch_read, raising WorksheetNotFound if it has no tab.
+    """
+
+    if gen not in data:
+        raise WorksheetNotFound(gen)
+
+    return data[gen]
+
+def batch_write(sheet: gspread.spreadsheet.Spreadsheet, updates: dict[str, dict]):
+    """
+    Writes the value ranges returned by Sheet.autofill, keyed by generator, in a single request.
+    Cells that are None are skipped by the API, so only the planned cells are written.
+    API CALLS: 0-1
+    """
+
+    if len(updates) == 0:
+        return
+
+    try:
+        call('write', sheet.values_batch_update, {
+            'valueInputOption': 'RAW',
+            'data': list(updates.values()),
+        }, gens=list(updates))
+
+    finally:
+        # a failed request may still have written some ranges
+        invalidate(updates)
+        mirror = get_mirror(sheet)
+        for gen, update in updates.items():
+            mirror.truncate(gen, a1_to_rowcol(update['range'].split('!')[-1].split(':')[0])[0])
+
+def generator_rng(seed: int | None, gen: str) -> np.random.Generator:
+    """
+    Returns the random generator for a generator's EAS readings, so that a preview and the autofill after it
+    given the same seed plan the same readings.
+    """
+
+    return np.random.default_rng(None if seed is None else [seed, zlib.crc32(gen.encode())])
+
+def preview(sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], end_date: date=date.today(), end_val: int | None = None, seed: int | None = None) -> tuple[pd.DataFrame, dict[str, Exception]]:
+    """
+    Plans the autofill of every generator in gens without writing anything.
+    Returns the planned rows of all generators in one DataFrame, and the errors of the generators that cannot be autofilled.
+    API CALLS: 1-2 (more for tabs not mirrored yet, see batch_read)
+    """
+
+    data = batch_read(sheet, gens)
+
+    schedules = []
+    errors = {}
+
+    for gen in gens:
+        try:
+            schedule = Sheet(sheet, gen).plan(end_date, end_val, tab_data(data, gen), generator_rng(seed, gen))
+            schedule.insert(0, 'generator', gen)
+            schedules.append(schedule)
+
+        except Exception as e:
+            errors[gen] = e
+
+    return (pd.concat(schedules, ignore_index=True) if len(schedules) > 0 else pd.DataFrame(), errors)
+
+# sheet headers -> viewer column names
+VIEW_COLUMNS = {
+    "To (State address. Each journey to be written on a separate line)": "Location",
+    "Requisitioner's Designation and Purpose": "Purpose",
+    "Time": "Started",
+    "": "Arrived",
+    "Travelling Time in minutes": "Travelling Time/min",
+    "Meter reading at journey's end. If not working write \"N.W.\"": "Meter reading",
+    "Driver's No. if any and Signature": "Driver's No. & Signature",
+    "Name and initials of person accompanying vehicle / authorising the journey": "Name",
+}
+CATEGORY_COLUMNS = ('Location', 'Purpose', 'Name') # few distinct values repeated on every row
+NUMBER_COLUMNS = ('Runtime', 'Meter reading')
+
+def arrow_dates(values: pd.Series) -> pd.Series:
+    """
+    Parses a column of dates to Arrow dates. Cells that are not dates become empty.
+    """
+
+    return parse_dates(values).astype('timestamp[s][pyarrow]').astype('date32[pyarrow]')
+
+def fully_parsed(values: pd.Series, parsed: pd.Series) -> bool:
+    """
+    Returns True if every cell of values with something written in it was parsed.
+    """
+
+    return not (parsed.isna() & (values.str.strip() != '').fillna(False)).any()
+
+def typed_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts the text columns of a log to compact types that st.dataframe passes to Arrow without copying:
+    dates to Arrow dates, readings and runtimes to floats, repeated text to categoricals and the rest to Arrow strings.
+    A date or number column with any cell that does not parse (e.g. "N.W." for a meter that is not working)
+    is left as text, so that nothing written in the log is hidden.
+    """
+
+    if 'Date' in df:
+        dates = arrow_dates(df['Date'])
+        if fully_parsed(df['Date'], dates):
+            df['Date'] = dates
+
+    for column in NUMBER_COLUMNS:
+        if column in df:
+            numbers = parse_numbers(df[column]).astype('float64')
+            if fully_parsed(df[column], numbers):
+                df[column] = numbers
+
+    for column in CATEGORY_COLUMNS:
+        if column in df:
+            df[column] = df[column].astype('category')
+
+    return df
+
+def fleet_status(sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], today: date | None = None) -> pd.DataFrame:
+    """
+    Returns the latest date and reading of every generator, with the runtime since its last POL top up
+    and the number of weeks its log is behind today, read together in one batched read and cached like the logs.
+    API CALLS: 0-2 (more for tabs not mirrored yet, see batch_read)
+    """
+
+    today = date.today() if today is None else today
+
+    return get_df(FLEET, lambda: download_fleet_status(sheet, gens, today), 'status', tuple(gens), today)
+
+def download_fleet_status(sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], today: date) -> pd.DataFrame:
+
+    data = batch_read(sheet, gens)
+    rows = []
+
+    for gen in gens:
+        log = Sheet(sheet, gen)
+
+        try:
+            log.data.update(tab_data(data, gen))
+            latest_date = log.get_latest_date()
+            latest_reading = log.get_latest_reading()
+            latest_pol = log.get_latest_pol_date_reading()
+            error = None
+        except Exception as e:
+            latest_date, latest_reading, latest_pol = None, None, None
+            error = str(e)
+
+        runtime = None if latest_reading is None or latest_pol is None else round(latest_reading - latest_pol[1], 2)
+
+        rows.append({
+            'generator': gen,
+            'latest date': None if latest_date is None else latest_date[0],
+            'reading': latest_reading,
+            'last POL top up': None if latest_pol is None else latest_pol[0],
+            'runtime since POL': runtime,
+            'runtime to POL limit': None if runtime is None else round(POL_LIMIT - runtime, 2),
+            'weeks behind': None if latest_date is None else max((today - latest_date[0]).days // 7, 0),
+            'error': error,
+        })
+
+    return pd.DataFrame(rows)
+
 class Sheet:
     """
     The class for a google sheet tab/sheet. Has functions to read and write data onto the sheet.
@@ -30,77 +311,90 @@ class Sheet:
 
     def __init__(self, sheet: gspread.spreadsheet.Spreadsheet, gen: str):
 
-        self.sheet = sheet.worksheet(gen)
-        self.data = {} # THIS IS TO STORE DATE AND READING VALUES, ENSURING THAT EACH COLUMN IS CALLED AT MOST ONCE EVERY AUTOFILL QUERY
+        self.spreadsheet = sheet
+        self.gen = gen
+        self.data = {} # THIS IS TO STORE DATE, ENTRY AND READING VALUES, ENSURING THAT THE SHEET IS READ AT MOST ONCE EVERY AUTOFILL QUERY
+
+    def load_data(self):
+        """
+        Reads the date, entry and reading columns of the sheet, see batch_read.
+        API CALLS: 1-2 (more if the tab is not mirrored yet)
+        """
+
+        self.data.update(tab_data(batch_read(self.spreadsheet, [self.gen]), self.gen))
 
     def get_latest_date(self) -> date | None:
         """
         Returns the latest entry date, together with the row number. Returns None if no date exists.
 
-        API CALLS: 1
+        API CALLS: 0-2 (see load_data)
         """
 
-        dates = self.sheet.col_values(DATE_COL)
-        self.data['dates'] = dates
-        rows = len(dates)
-        dates = [date for date in dates if isdate(date)]
+        if 'dates' not in self.data:
+            self.load_data()
 
-        if len(dates) == 0:
+        rows = self.data.get('start', 1) - 1 + len(self.data['dates'])
+        latest = last_valid(parse_dates(self.data['dates']))
+
+        if latest is None:
             return None
 
         else:
-            return (datetime.strptime(dates[-1], DATE_READ_FORMAT).date(), rows)
+            return (latest[1].date(), rows)
 
     def get_latest_reading(self) -> float | None:
         """
         Returns the latest entry runtime reading. Returns None if no reading exists.
-        API CALLS: 1
+        API CALLS: 0-2 (see load_data)
         """
-        
-        readings = self.sheet.col_values(READING_COL)
-        self.data['readings'] = readings
-        readings = [float(reading) for reading in readings if isfloat(reading)]
 
-        if len(readings) == 0:
+        if 'readings' not in self.data:
+            self.load_data()
+
+        latest = last_valid(parse_numbers(self.data['readings']))
+
+        if latest is None:
             return None
 
         else:
-            return readings[-1]
+            return float(latest[1])
 
     def get_latest_pol_date_reading(self) -> date | None:
         """
         Returns the last POL top up date, as well as the reading after the top up. Returns None is no top up exists.
-        API CALLS: 1-3
+        API CALLS: 0-2 (see load_data)
         """
 
-        if "dates" not in self.data:
-            self.get_latest_date()
-        if "readings" not in self.data:
-            self.get_latest_reading()
+        if "entries" not in self.data:
+            self.load_data()
 
         if self.data['dates'] is None or self.data['readings'] is None:
             return None
-        
-        entries = tuple(zip(self.data['dates'], self.sheet.col_values(ENTRY_COL), self.data['readings']))
 
-        for entry_date, entry, reading in reversed(entries):
-            if entry == "TOP UP POL":
-                return (datetime.strptime(entry_date, DATE_READ_FORMAT).date(), float(reading))
+        rows = min(len(self.data['dates']), len(self.data['entries']), len(self.data['readings']))
+        top_ups = np.flatnonzero(np.asarray(self.data['entries'][:rows], dtype=object) == "TOP UP POL")
 
-        return None
+        if len(top_ups) == 0:
+            return None
+
+        row = top_ups[-1]
+        return (datetime.strptime(self.data['dates'][row], DATE_READ_FORMAT).date(), float(self.data['readings'][row]))
 
-    def autofill(self, gen: str, name: str="", end_date: date=date.today(), end_val: int | None = None):
+    def plan(self, end_date: date=date.today(), end_val: int | None = None, data: dict[str, list[str]] | None = None, rng: np.random.Generator | None = None) -> pd.DataFrame:
         """
-        Fills the spreadsheet with 0.5h runtime entries, automatically closes sheets every month and logs POL top ups
-        API CALLS: 4
+        Returns the rows autofill would write until end_date (see planner.plan), without writing anything.
+        If data is given (see batch_read), the columns are not read from the sheet again.
+        API CALLS: 0 if data is given, otherwise see load_data
         """
 
         self.data.clear()
+        if data is not None:
+            self.data.update(data)
 
         # GET DATA FROM SHEET
-        latest_date = self.get_latest_date()                            # 1 API CALL
-        latest_reading = self.get_latest_reading()                      # 1 API CALL
-        latest_pol_date_reading = self.get_latest_pol_date_reading()    # 1 API CALL
+        latest_date = self.get_latest_date()                            # 0-2 API CALLS
+        latest_reading = self.get_latest_reading()                      # 0 API CALLS
+        latest_pol_date_reading = self.get_latest_pol_date_reading()    # 0 API CALLS
 
         if latest_date is None or latest_reading is None:
             raise ValueError("Sheet needs at least one runtime entry before autofill")
@@ -110,97 +404,196 @@ class Sheet:
 
         # SET PARAMETERS
         latest_date, row = latest_date
-        num_weeks = (end_date - latest_date).days // 7
+        num_weeks = max((end_date - latest_date).days // 7, 0)
+        increments = weekly_increments(num_weeks, None if end_val is None else end_val - latest_reading, rng)
 
-        if end_val is None:
-            weekly_average = 0.5
-            weekly_increments = np.full(num_weeks, weekly_average)
+        runtime = 0.0 if latest_pol_date_reading is None else latest_reading - latest_pol_date_reading[1] # runtime since last POL top up
 
-        else:
-            diff = end_val - latest_reading
-            weekly_average = diff / num_weeks
-            
-            deviations = np.random.normal(0, EAS_ENTRY_STD_DEV, num_weeks)
+        return plan(latest_date, row + 1, latest_reading, runtime, increments)
 
-            weekly_increments = weekly_average + deviations
+    def autofill(self, gen: str, name: str="", end_date: date=date.today(), end_val: int | None = None, data: dict[str, list[str]] | None = None, rng: np.random.Generator | None = None) -> dict | None:
+        """
+        Plans 0.5h runtime entries to fill the spreadsheet with, automatically closing sheets every month and logging POL top ups.
+        If data is given (see batch_read), the columns are not read from the sheet again.
+        Returns the rows to write as a value range (see batch_write), or None if there is nothing to write.
+        The rows are written by writequeue.autofill_batch, together with other generators.
+        API CALLS: 0 if data is given, otherwise see load_data
+        """
 
-            total_sum = weekly_increments.sum()
-            adjustment_factor = diff / total_sum
+        schedule = self.plan(end_date, end_val, data, rng)
 
-            weekly_increments *= adjustment_factor
-            weekly_increments = np.round(weekly_increments, 2)
+        if len(schedule) == 0:
+            print(f"Autofill generator {gen} has nothing to update") # debug text
+            return None
 
-            final_adjustment = round(diff - weekly_increments[:-1].sum(), 2)
+        update = {
+            'range': absolute_range_name(gen, f"{rowcol_to_a1(schedule['row'].iloc[0], 1)}:{rowcol_to_a1(schedule['row'].iloc[-1], NUM_COLS)}"),
+            'values': to_values(schedule, name),
+        }
 
-            weekly_increments[-1] = final_adjustment
+        return update
 
-            if weekly_increments.min() < 0:
-                raise ValueError("Difference between last reading and target reading too small, good luck bro")
+    def get_sheet_as_df(self) -> pd.DataFrame:
+        """
+        Returns the whole log as a DataFrame, shared between sessions until it expires or the sheet is autofilled.
+        API CALLS: 0-3 (see download_df)
+        """
 
-        index = 0 # to loop through weekly_increments
+        return get_df(self.gen, self.download_df)
 
-        runtime = 0.0 if latest_pol_date_reading is None else latest_reading - latest_pol_date_reading[1] # runtime since last POL top up
-        limit = 20.0 # maximum runtime between consecutive POL top ups
+    def get_page_df(self, pages: int = 1) -> tuple[pd.DataFrame, bool]:
+        """
+        Returns the last pages * PAGE_ROWS rows of the log as a DataFrame, cached like get_sheet_as_df,
+        and whether there are older rows. Only those rows are read, older rows are read as more pages are asked for.
+        API CALLS: 0-3 (see window)
+        """
+
+        return get_df(self.gen, lambda: self.download_page_df(pages), 'page', pages)
+
+    def get_range_df(self, start_date: date, end_date: date) -> pd.DataFrame:
+        """
+        Returns the rows of the log dated from start_date to end_date, along with the rows between them without a date.
+        Since the dates of a log only go up, the rows are found by bisecting the log (see date_bounds) and only they are read.
+        API CALLS: 0 if cached, otherwise 1-4 (see window) and one more for every step of date_bounds not in the mirror
+        """
 
-        cell_list = []
+        return get_df(self.gen, lambda: self.download_range_df(start_date, end_date), 'range', start_date, end_date)
 
-        while latest_date + timedelta(days=7) <= end_date:
+    def window(self, rows: int) -> int:
+        """
+        Makes sure the mirror holds at least the last rows rows of the log, after fetching any new rows.
+        Returns the first of those rows. If a request fails, the rows already mirrored are used.
+        API CALLS: 1-3, one of them to the Drive API
+        """
 
-            if latest_date.month != (latest_date + timedelta(days=7)).month: # closes book for previous month
-                row += 1
-                cell_list.append(Cell(row=row, col=ADDRESS_COL, value=f"BOOK CLOSED FOR {latest_date.strftime('%b').upper()} {latest_date.strftime('%Y')}"))
+        mirror = get_mirror(self.spreadsheet)
+        mirror.sync(self.spreadsheet, [self.gen], strict=False, tail=rows)
 
-            # EAS update
-            latest_date += timedelta(days=7)
-            latest_reading += weekly_increments[index]
-            runtime += weekly_increments[index]
-            row += 1
+        tab = mirror.tab(self.gen)
+        if tab is None:
+            return HEADER_ROW + 1
 
-            cell_list.extend([
-                Cell(row=row, col=DATE_COL, value=date.strftime(latest_date, DATE_WRITE_FORMAT)),
-                Cell(row=row, col=ADDRESS_COL, value="JC1"),
-                Cell(row=row, col=ENTRY_COL, value="EAS"),
-                Cell(row=row, col=RUNTIME_COL, value=weekly_increments[index]),
-                Cell(row=row, col=READING_COL, value=round(latest_reading, 2)),
-                Cell(row=row, col=NAME_COL, value=name)
-            ])
+        first = max(HEADER_ROW + 1, tab['synced'] - rows + 1)
+        if tab['lo'] > first:
+            mirror.extend(self.spreadsheet, [self.gen], tab['lo'] - first, strict=False)
 
-            # top up POL
-            if runtime >= limit:
-                row += 1
+        return max(first, mirror.tab(self.gen)['lo'])
 
-                cell_list.extend([
-                    Cell(row=row, col=DATE_COL, value=date.strftime(latest_date, DATE_WRITE_FORMAT)),
-                    Cell(row=row, col=ADDRESS_COL, value="POL RECEIVED FROM TCC"),
-                    Cell(row=row, col=ENTRY_COL, value="TOP UP POL"),
-                    Cell(row=row, col=READING_COL, value=round(latest_reading, 2)),
-                    Cell(row=row, col=FUEL_COL, value="60l"),
-                    Cell(row=row, col=NAME_COL, value=name)
-                ])
+    def download_page_df(self, pages: int) -> tuple[pd.DataFrame, bool]:
 
-                runtime = 0.0
+        first = self.window(pages * PAGE_ROWS)
+        return (self.mirrored_df(first), first > HEADER_ROW + 1)
 
-            index += 1
+    def date_bounds(self, targets: list[date], last: int) -> list[tuple[int, int]]:
+        """
+        Narrows down, for every date in targets, the rows up to last where the first entry dated on or after it can be,
+        by bisecting the log with probes of PROBE_ROWS dates, in one request per step for every date.
+        Probes of mirrored rows are read from the mirror. Returns (lo, hi) for every date, the entry being from lo to hi + 1,
+        with under PROBE_ROWS rows between them unless a probe found no date.
+        API CALLS: 0 or more (about log2 of the rows before the mirrored ones divided by PROBE_ROWS)
+        """
 
-        if len(cell_list) > 0:
-            self.sheet.update_cells(cell_list) # 1 API CALL
+        mirror = get_mirror(self.spreadsheet)
+        mirrored = mirror.tab(self.gen)['lo']
+        bounds = [[HEADER_ROW + 2, last] for _ in targets]
+        active = list(range(len(targets)))
 
-        print(f"Autofill generator {gen} success!") # debug text
-        return True
+        while True:
+            active = [i for i in active if bounds[i][1] - bounds[i][0] + 1 > PROBE_ROWS]
+            if len(active) == 0:
+                return [tuple(bound) for bound in bounds]
 
-    def get_sheet_as_df(self) -> pd.DataFrame:
+            blocks = {}
+            for i in active:
+                mid = (bounds[i][0] + bounds[i][1]) // 2
+                blocks[i] = (mid, min(mid + PROBE_ROWS - 1, bounds[i][1]))
+
+            remote = {i: block for i, block in blocks.items() if block[0] < mirrored}
+            dates = {i: mirror.columns(self.gen, {'dates': DATE_COL}, start)['dates'][:end - start + 1] for i, (start, end) in blocks.items() if i not in remote}
+
+            if len(remote) > 0:
+                value_ranges = call('read', self.spreadsheet.values_batch_get, [
+                    absolute_range_name(self.gen, f"{rowcol_to_a1(start, DATE_COL)}:{rowcol_to_a1(end, DATE_COL)}")
+                    for start, end in remote.values()
+                ], gens=[self.gen]).get('valueRanges', [])
+
+                for i, value_range in zip(remote, value_ranges):
+                    dates[i] = [row[0] if len(row) > 0 else '' for row in value_range.get('values', [])]
+
+            for i, (start, _) in blocks.items():
+                parsed = parse_dates(dates[i])
+                index = parsed.first_valid_index()
+
+                if index is None: # nothing to bisect on, so those rows are read whole
+                    active.remove(i)
+                elif parsed[index].date() >= targets[i]:
+                    bounds[i][1] = start + index - 1
+                else:
+                    bounds[i][0] = start + index + 1
+
+    def download_range_df(self, start_date: date, end_date: date) -> pd.DataFrame:
+
+        mirror = get_mirror(self.spreadsheet)
+        self.window(PAGE_ROWS) # the rows appended since the last read
+
+        tab = mirror.tab(self.gen)
+        if tab is None:
+            return pd.DataFrame()
+
+        (first, _), (_, last) = self.date_bounds([start_date, end_date + timedelta(days=1)], tab['synced'])
+
+        if first >= tab['lo']:
+            df = self.mirrored_df(first, last)
+
+        else:
+            values = [] if last < first else call('read', self.spreadsheet.values_batch_get, [
+                absolute_range_name(self.gen, f"{rowcol_to_a1(first, 1)}:{rowcol_to_a1(last, NUM_COLS)}")
+            ], gens=[self.gen]).get('valueRanges', [{}])[0].get('values', [])
+            df = self.rows_df(mirror.rows(self.gen, HEADER_ROW, HEADER_ROW), values, first)
+
+        if 'Date' not in df:
+            return df
+
+        # rows without a date (e.g. BOOK CLOSED) belong to the date before them
+        dated = (df['Date'] if df['Date'].dtype == 'date32[pyarrow]' else arrow_dates(df['Date'])).ffill()
+
+        return df[((dated >= start_date) & (dated <= end_date)).fillna(False)]
+
+    def download_df(self) -> pd.DataFrame:
+        """
+        Builds the DataFrame like Worksheet.get_all_records, from the local mirror after fetching any new rows
+        and any older rows that only autofill has read so far. If the sync fails, the rows already mirrored are shown.
+        API CALLS: 1-3, one of them to the Drive API (more for logs with over SYNC_WINDOW rows to fetch)
+        """
+
+        mirror = get_mirror(self.spreadsheet)
+        mirror.sync(self.spreadsheet, [self.gen], strict=False)
+        mirror.extend(self.spreadsheet, [self.gen], strict=False)
+
+        return self.mirrored_df(HEADER_ROW + 1)
+
+    def mirrored_df(self, first: int, last: int | None = None, typed: bool = True) -> pd.DataFrame:
+        """
+        Builds the DataFrame like Worksheet.get_all_records from the mirrored rows of the log from first onwards (up to last),
+        indexed by row number. The row under the header is left out.
+        """
+
+        mirror = get_mirror(self.spreadsheet)
+        return self.rows_df(mirror.rows(self.gen, HEADER_ROW, HEADER_ROW), mirror.rows(self.gen, first, last), first, typed)
+
+    def rows_df(self, header: list[list[str]], values: list[list[str]], first: int, typed: bool = True) -> pd.DataFrame:
+        """
+        Builds the DataFrame like Worksheet.get_all_records from the header row (if mirrored) and the rows from first onwards.
+        If typed is False, every column is left as the text in the sheet instead of converted by typed_df.
+        """
+
+        rows = fill_gaps(header + values)
+
+        if len(rows) == 0:
+            return pd.DataFrame()
+
+        df = pd.DataFrame(rows[1:], columns=rows[0], index=pd.RangeIndex(first, first + len(rows) - 1), dtype='string[pyarrow]')
+        df = df.loc[:, ~df.columns.duplicated(keep='last')] # like get_all_records, the last of columns with the same header wins
+        df = df.rename(columns=VIEW_COLUMNS).drop([HEADER_ROW + 1], errors='ignore')
 
-        df = pd.DataFrame(self.sheet.get_all_records())
-        df = df.rename(columns={
-            "To (State address. Each journey to be written on a separate line)": "Location",
-            "Requisitioner's Designation and Purpose": "Purpose",
-            "Time": "Started",
-            "": "Arrived",
-            "Travelling Time in minutes": "Travelling Time/min",
-            "Meter reading at journey's end. If not working write \"N.W.\"": "Meter reading",
-            "Driver's No. if any and Signature": "Driver's No. & Signature",
-            "Name and initials of person accompanying vehicle / authorising the journey": "Name",
-        }).drop([0])
-        df['Date'] = df['Date'].astype('string').apply(format_date)
-
-        return df
+        return typed_df(df) if typed else df
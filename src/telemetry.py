@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # upper bounds in seconds, the last bucket is unbounded
+LOG_LEVEL = os.environ.get('GENLOG_API_LOG', 'INFO') # level of the structured log line written for every API call
+
+logger = logging.getLogger('genlog.api')
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+def empty_op() -> dict:
+
+    return {'calls': 0, 'errors': 0, 'quota_errors': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+            'bytes_sent': 0, 'bytes_received': 0, 'histogram': [0] * (len(LATENCY_BUCKETS) + 1)}
+
+def empty_gen() -> dict:
+
+    return {'calls': 0, 'errors': 0, 'quota_errors': 0, 'seconds': 0.0, 'max_seconds': 0.0}
+
+stats = {'ops': defaultdict(empty_op), 'gens': defaultdict(empty_gen), 'since': time.time()} # shared by every session in the process
+stats_lock = threading.Lock()
+
+def payload_size(payload) -> int:
+    """
+    Returns the size in bytes of payload as JSON, roughly what is sent or received over the wire.
+    """
+
+    try:
+        return len(json.dumps(payload, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+def bucket(seconds: float) -> int:
+
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(LATENCY_BUCKETS)
+
+def record(kind: str, op: str, gens: list[str], seconds: float, sent: int, received: int,
+           error: Exception | None = None, quota_error: bool = False):
+    """
+    Adds one API request to the stats of its operation and of every generator it touched, and logs it as a JSON line.
+    """
+
+    with stats_lock:
+        entry = stats['ops'][op]
+        entry['calls'] += 1
+        entry['errors'] += error is not None
+        entry['quota_errors'] += quota_error
+        entry['seconds'] += seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        entry['bytes_sent'] += sent
+        entry['bytes_received'] += received
+        entry['histogram'][bucket(seconds)] += 1
+
+        for gen in gens:
+            entry = stats['gens'][gen]
+            entry['calls'] += 1
+            entry['errors'] += error is not None
+            entry['quota_errors'] += quota_error
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+
+    logger.info(json.dumps({
+        'event': 'api_call',
+        'kind': kind,
+        'op': op,
+        'gens': gens,
+        'ms': round(seconds * 1000, 1),
+        'bytes_sent': sent,
+        'bytes_received': received,
+        'status': 429 if quota_error else 'error' if error is not None else 'ok',
+        'error': None if error is None else str(error)[:200],
+    }))
+
+def snapshot() -> dict:
+    """
+    Returns a copy of the stats, safe to read while other threads keep recording.
+    """
+
+    with stats_lock:
+        return {
+            'ops': {op: {**entry, 'histogram': list(entry['histogram'])} for op, entry in stats['ops'].items()},
+            'gens': {gen: dict(entry) for gen, entry in stats['gens'].items()},
+            'since': stats['since'],
+        }
+
+def reset():
+
+    with stats_lock:
+        stats['ops'].clear()
+        stats['gens'].clear()
+        stats['since'] = time.time()
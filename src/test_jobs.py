@@ -0,0 +1,28 @@
+"""
+Checks that background autofill jobs always finish, against the fake spreadsheet:
+    python -m pytest test_jobs.py
+"""
+
+from datetime import date, timedelta
+from fake import FakeSpreadsheet, HEADER, make_log
+from jobs import start_job
+
+def test_job_reports_every_sheet():
+
+    ss = FakeSpreadsheet({'X': make_log(20, date.today() - timedelta(days=28)), 'Z': [list(HEADER)]})
+    job = start_job(ss, ['X', 'Z'], "A")
+    job.thread.join(60)
+
+    progress = job.snapshot()
+    assert progress['finished'] is not None
+    assert progress['status'] == {'X': 'updated', 'Z': 'failed'}
+
+def test_job_without_spreadsheet_fails_every_sheet():
+
+    job = start_job(None, ['X', 'Y']) # e.g. authentication failed
+    job.thread.join(60)
+
+    progress = job.snapshot()
+    assert progress['finished'] is not None
+    assert progress['status'] == {'X': 'failed', 'Y': 'failed'}
+    assert set(progress['errors']) == {'X', 'Y'}
@@ -0,0 +1,96 @@
+"""
+Checks that autofill runs resume from their journal against the fake spreadsheet:
+    python -m pytest test_journal.py
+"""
+
+from datetime import date, timedelta
+from fake import FakeSpreadsheet, HEADER, make_log
+from journal import get_journal, run_id, update_rows
+from sheet import batch_read, batch_write, Sheet
+from writequeue import autofill_batch
+
+def spreadsheet() -> FakeSpreadsheet:
+    """
+    Returns a spreadsheet with two logs four weeks behind, and a third with no entries that cannot be autofilled.
+    """
+
+    behind = date.today() - timedelta(days=28)
+    return FakeSpreadsheet({'X': make_log(20, behind), 'Y': make_log(20, behind), 'Z': [list(HEADER)]})
+
+def written(ss: FakeSpreadsheet) -> int:
+
+    return ss.stats['calls']['values_batch_update']
+
+def planned(ss: FakeSpreadsheet, gen: str) -> dict:
+
+    return Sheet(ss, gen).autofill(gen, "A", data=batch_read(ss, [gen])[gen])
+
+def test_run_id_is_scoped_to_gens():
+
+    ss = spreadsheet()
+    assert run_id(ss, ['X', 'Y'], "A", date.today(), None) == run_id(ss, ['Y', 'X'], "A", date.today(), None)
+    assert run_id(ss, ['X', 'Y'], "A", date.today(), None) != run_id(ss, ['X'], "A", date.today(), None)
+
+def test_retry_skips_written_tabs():
+
+    ss = spreadsheet()
+    run = run_id(ss, ['X', 'Z'], "A", date.today(), None)
+
+    results = autofill_batch(ss, ['X', 'Z'], "A", run=run)
+    assert results['X'] is None and results['Z'] is not None
+    rows = [list(row) for row in ss.tab('X').rows]
+
+    ss.reset_stats()
+    results = autofill_batch(ss, ['X', 'Z'], "A", run=run)
+    assert results['X'] is None and results['Z'] is not None
+    assert written(ss) == 0
+    assert ss.tab('X').rows == rows
+
+def test_retry_plans_changed_tabs_again():
+
+    ss = spreadsheet()
+    run = run_id(ss, ['X', 'Z'], "A", date.today(), None)
+    before = len(ss.tab('X').cells({}))
+
+    autofill_batch(ss, ['X', 'Z'], "A", run=run)
+    after = len(ss.tab('X').cells({}))
+    assert after > before
+
+    # the autofilled rows are cleared, so the committed entry no longer matches the tab
+    blank = [[''] * 13 for _ in range(after - before)]
+    ss.values_batch_update({'data': [{'range': f"'X'!A{before + 1}:M{after}", 'values': blank}]})
+
+    ss.reset_stats()
+    assert autofill_batch(ss, ['X', 'Z'], "A", run=run)['X'] is None
+    assert written(ss) == 1
+    assert len(ss.tab('X').cells({})) == after
+
+def test_retry_writes_planned_rows():
+
+    ss = spreadsheet()
+    run = run_id(ss, ['X'], "A", date.today(), None)
+    update = planned(ss, 'X')
+    get_journal(ss).plan(run, 'X', update) # planned, then the write never went out
+
+    assert autofill_batch(ss, ['X'], "A", run=run, seed=1)['X'] is None
+
+    first, last = update_rows(update)
+    cells = ss.tab('X').cells({})
+    assert len(cells) == last
+    assert cells[first - 1][0] == update['values'][0][0]
+    assert get_journal(ss).entries(run)['X']['status'] == 'committed'
+
+def test_retry_commits_landed_write():
+
+    ss = spreadsheet()
+    run = run_id(ss, ['X'], "A", date.today(), None)
+    update = planned(ss, 'X')
+    get_journal(ss).plan(run, 'X', update)
+    batch_write(ss, {'X': update}) # written, then the attempt stopped before committing it
+    rows = [list(row) for row in ss.tab('X').rows]
+
+    ss.reset_stats()
+    assert autofill_batch(ss, ['X'], "A", run=run)['X'] is None
+    assert written(ss) == 0
+    assert ss.tab('X').rows == rows
+    assert get_journal(ss).entries(run)['X']['status'] == 'committed'
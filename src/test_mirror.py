@@ -0,0 +1,138 @@
+"""
+Checks the local mirror against the fake spreadsheet:
+    python -m pytest test_mirror.py
+"""
+
+import csv
+import io
+import zipfile
+from export import export_logs
+from fake import FakeSpreadsheet, make_log
+from mirror import get_mirror, HEADER_ROW, SYNC_WINDOW
+from sheet import batch_read, Sheet, TAIL_ROWS
+from utility import DATE_COL, ENTRY_COL, READING_COL
+
+def test_blank_row_at_window_end():
+
+    rows = make_log(SYNC_WINDOW + 200)
+    rows[SYNC_WINDOW - 1] = [] # the API leaves it out of the first window, which comes back short
+    ss = FakeSpreadsheet({'A': rows})
+    entries = sum(len(row) > 0 for row in rows[HEADER_ROW:])
+
+    df = Sheet(ss, 'A').get_sheet_as_df()
+    assert len(df) == entries
+    assert df.index[-1] == len(rows)
+
+    archive = io.BytesIO()
+    export_logs(ss, ['A'], archive, 'csv')
+    with zipfile.ZipFile(archive) as z, z.open('A.csv') as f:
+        assert len(list(csv.DictReader(io.TextIOWrapper(f, encoding='utf-8')))) == entries
+
+def test_sync_sees_changes():
+
+    ss = FakeSpreadsheet({'A': make_log(50)})
+    mirror = get_mirror(ss)
+    mirror.sync(ss, ['A'])
+    last = len(ss.tab('A').rows)
+
+    ss.reset_stats()
+    mirror.sync(ss, ['A'])
+    assert 'values_batch_get' not in ss.stats['calls'] # Drive reports no change
+
+    ss.edit('A', ['', "BOOK CLOSED FOR JAN 2026"])
+    ss.values_batch_update({'data': [{'range': f"'A'!H{last}", 'values': [["N.W."]]}]})
+    mirror.sync(ss, ['A'])
+
+    assert mirror.rows('A', last)[0][READING_COL - 1] == "N.W."
+    assert mirror.rows('A', last + 1)[0][1] == "BOOK CLOSED FOR JAN 2026"
+    assert mirror.tab('A')['synced'] == last + 1
+
+def test_force_fetches_unreported_changes():
+
+    ss = FakeSpreadsheet({'A': make_log(50)}, drive_lag=60)
+    mirror = get_mirror(ss)
+    mirror.sync(ss, ['A'])
+
+    ss.edit('A', ['', "BOOK CLOSED FOR JAN 2026"]) # Drive does not report it for a minute
+    mirror.sync(ss, ['A'])
+    assert mirror.tab('A')['synced'] == len(ss.tab('A').rows) - 1
+
+    mirror.sync(ss, ['A'], force=True)
+    assert mirror.tab('A')['synced'] == len(ss.tab('A').rows)
+
+def test_tail_extend_and_truncate():
+
+    ss = FakeSpreadsheet({'A': make_log(300)})
+    last = len(ss.tab('A').rows)
+    mirror = get_mirror(ss)
+
+    mirror.sync(ss, ['A'], tail=10)
+    assert (mirror.tab('A')['lo'], mirror.tab('A')['synced']) == (last - 9, last)
+    assert mirror.rows('A', HEADER_ROW, HEADER_ROW) == [ss.tab('A').rows[0]]
+
+    mirror.extend(ss, ['A'], 20)
+    assert mirror.tab('A')['lo'] == last - 29
+    mirror.extend(ss, ['A'])
+    assert mirror.tab('A')['lo'] == HEADER_ROW + 1
+    assert mirror.rows('A', HEADER_ROW + 2) == ss.tab('A').cells({})[HEADER_ROW + 1:]
+
+    mirror.truncate('A', last - 4)
+    assert mirror.tab('A')['synced'] == last - 5
+    assert mirror.tab('A')['modified'] is None # fetched again whatever Drive reports
+    mirror.sync(ss, ['A'])
+    assert mirror.rows('A', HEADER_ROW + 2) == ss.tab('A').cells({})[HEADER_ROW + 1:]
+
+    mirror.truncate('A', HEADER_ROW + 1) # nothing of the window left
+    assert mirror.tab('A') is None
+
+def top_up(rows: list[list[str]], row: int):
+    """
+    Turns a row of a log from make_log into a POL top up.
+    """
+
+    rows[row - 1] = [rows[row - 1][DATE_COL - 1], "POL RECEIVED FROM TCC", "TOP UP POL", "", "", "", "", rows[row - 1][READING_COL - 1]]
+
+def test_tail_window_reaches_last_top_up():
+
+    rows = make_log(1000)
+    top_up(rows, 600)
+    top_up(rows, 590)
+    ss = FakeSpreadsheet({'A': rows, 'B': make_log(300)})
+
+    data = batch_read(ss, ['A', 'B'])
+    mirror = get_mirror(ss)
+
+    # only widened back to the last top up, not to the start of the log
+    assert HEADER_ROW + 1 < mirror.tab('A')['lo'] <= 600 < len(rows) - TAIL_ROWS
+    assert mirror.tab('A')['last_pol_row'] == 600
+    assert mirror.tab('A')['last_date_row'] == len(rows)
+    assert data['A']['start'] == 600
+    assert data['A']['entries'][0] == "TOP UP POL"
+
+    # a log without top ups is mirrored whole, to know there is none
+    assert mirror.tab('B')['lo'] == HEADER_ROW + 1
+    assert mirror.tab('B')['last_pol_row'] == 0
+
+    log = Sheet(ss, 'A')
+    log.data.update(data['A'])
+    assert log.get_latest_pol_date_reading()[1] == float(rows[599][READING_COL - 1])
+    assert log.get_latest_date()[1] == len(rows)
+
+def test_index_follows_writes():
+
+    ss = FakeSpreadsheet({'A': make_log(300)})
+    batch_read(ss, ['A'])
+    mirror = get_mirror(ss)
+    last = len(ss.tab('A').rows)
+
+    ss.values_batch_update({'data': [{'range': f"'A'!C{last}", 'values': [["TOP UP POL"]]}]})
+    mirror.truncate('A', last)
+    batch_read(ss, ['A'])
+    assert mirror.tab('A')['last_pol_row'] == last
+
+    ss.values_batch_update({'data': [{'range': f"'A'!H{last}", 'values': [["N.W."]]}]})
+    mirror.truncate('A', last)
+    batch_read(ss, ['A'])
+    assert mirror.tab('A')['last_reading_row'] == last - 1
+    assert mirror.tab('A')['last_dated_row'] == last
+    assert mirror.rows('A', last)[0][ENTRY_COL - 1] == "TOP UP POL"
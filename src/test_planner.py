@@ -0,0 +1,106 @@
+"""
+Checks the column planner against the row-by-row loop Sheet.autofill used before it:
+    python -m pytest test_planner.py
+"""
+
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from planner import plan, to_values, weekly_increments, POL_LIMIT
+from utility import DATE_WRITE_FORMAT, DATE_COL, ADDRESS_COL, ENTRY_COL, RUNTIME_COL, READING_COL, FUEL_COL, NAME_COL
+
+CASES = 1000
+BOUNDARY = 1e-6 # runtimes this close to POL_LIMIT may top up a week apart, as the loop summed them as floats
+
+def legacy_rows(latest_date: date, row: int, latest_reading: float, runtime: float, increments: np.ndarray, end_date: date, name: str) -> tuple[dict, bool]:
+    """
+    Returns the cells the old loop wrote (row -> column -> value), and whether any top up was decided
+    on a runtime within BOUNDARY of POL_LIMIT.
+    """
+
+    cells = {}
+    boundary = False
+    index = 0
+
+    while latest_date + timedelta(days=7) <= end_date:
+
+        if latest_date.month != (latest_date + timedelta(days=7)).month: # closes book for previous month
+            row += 1
+            cells[row] = {ADDRESS_COL: f"BOOK CLOSED FOR {latest_date.strftime('%b').upper()} {latest_date.strftime('%Y')}"}
+
+        # EAS update
+        latest_date += timedelta(days=7)
+        latest_reading += increments[index]
+        runtime += increments[index]
+        row += 1
+
+        cells[row] = {
+            DATE_COL: date.strftime(latest_date, DATE_WRITE_FORMAT),
+            ADDRESS_COL: "JC1",
+            ENTRY_COL: "EAS",
+            RUNTIME_COL: increments[index],
+            READING_COL: round(latest_reading, 2),
+            NAME_COL: name,
+        }
+        index += 1
+
+        boundary |= abs(runtime - POL_LIMIT) < BOUNDARY
+
+        # top up POL
+        if runtime >= POL_LIMIT:
+            row += 1
+            cells[row] = {
+                DATE_COL: date.strftime(latest_date, DATE_WRITE_FORMAT),
+                ADDRESS_COL: "POL RECEIVED FROM TCC",
+                ENTRY_COL: "TOP UP POL",
+                READING_COL: round(latest_reading, 2),
+                FUEL_COL: "60l",
+                NAME_COL: name,
+            }
+            runtime = 0.0
+
+    return cells, boundary
+
+def planned_rows(latest_date: date, row: int, latest_reading: float, runtime: float, increments: np.ndarray, name: str) -> dict:
+
+    schedule = plan(latest_date, row + 1, latest_reading, runtime, increments)
+    values = to_values(schedule, name)
+
+    return {
+        int(number): {col: value for col, value in enumerate(cells, 1) if value is not None}
+        for number, cells in zip(schedule['row'], values)
+    }
+
+def test_plan_matches_legacy_loop():
+
+    rng = np.random.default_rng(0)
+    moved = 0 # schedules with a top up in another week
+
+    for _ in range(CASES):
+        latest_date = date(2023, 1, 1) + timedelta(days=int(rng.integers(0, 1000)))
+        num_weeks = int(rng.integers(1, 120))
+        end_date = latest_date + timedelta(days=7 * num_weeks + int(rng.integers(0, 7)))
+        row = int(rng.integers(2, 5000))
+        latest_reading = round(float(rng.uniform(0, 5000)), 2)
+        runtime = round(float(rng.uniform(0, POL_LIMIT)), 2)
+        diff = None if rng.random() < 0.5 else round(float(rng.uniform(0.3, 1.5) * num_weeks), 2)
+
+        try:
+            increments = weekly_increments(num_weeks, diff, rng)
+        except ValueError: # too small a difference, refused before any row is planned
+            continue
+
+        expected, boundary = legacy_rows(latest_date, row, latest_reading, runtime, increments, end_date, "A")
+
+        if planned_rows(latest_date, row, latest_reading, runtime, increments, "A") != expected:
+            assert boundary # only a float sum landing just off POL_LIMIT may move a top up
+            moved += 1
+
+    assert moved < CASES // 100
+
+def test_final_reading_needs_a_week():
+
+    with pytest.raises(ValueError):
+        weekly_increments(0, 10.0)
+
+    assert len(weekly_increments(0)) == 0
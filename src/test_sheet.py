@@ -0,0 +1,47 @@
+"""
+Checks the batched reads of sheet.py against the fake spreadsheet:
+    python -m pytest test_sheet.py
+"""
+
+from datetime import date, timedelta
+from gspread.exceptions import WorksheetNotFound
+from fake import FakeSpreadsheet, make_log
+from generators import get_registry
+from sheet import batch_read, fleet_status, preview
+from writequeue import autofill_batch
+from validate import validate
+
+def spreadsheet() -> FakeSpreadsheet:
+
+    behind = date.today() - timedelta(days=28)
+    return FakeSpreadsheet({'X': make_log(20, behind), 'Y': make_log(20, behind)})
+
+def test_missing_tab_fails_only_its_generator():
+
+    ss = spreadsheet()
+
+    assert set(batch_read(ss, ['X', 'GONE'])) == {'X'}
+
+    _, errors = preview(ss, ['X', 'GONE'])
+    assert list(errors) == ['GONE'] and isinstance(errors['GONE'], WorksheetNotFound)
+
+    report = validate(ss, ['X', 'GONE'])
+    assert report[['generator', 'check']].values.tolist() == [['GONE', 'tab']]
+
+    status = fleet_status(ss, ['X', 'GONE']).set_index('generator')
+    assert status.loc['X', 'error'] is None and status.loc['GONE', 'error'] is not None
+
+    results = autofill_batch(ss, ['X', 'GONE'], "A")
+    assert results['X'] is None and isinstance(results['GONE'], WorksheetNotFound)
+
+def test_renamed_tab_fails_only_its_generator():
+
+    ss = spreadsheet()
+    get_registry(ss) # loaded before the tab is renamed
+
+    tab = ss.tabs.pop('Y')
+    tab.title = 'Y (old)'
+    ss.tabs[tab.title] = tab
+
+    assert set(batch_read(ss, ['X', 'Y'])) == {'X'}
+    assert get_registry(ss).missing(['X', 'Y']) == ['Y']
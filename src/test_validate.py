@@ -0,0 +1,45 @@
+"""
+Checks the log validation against the fake spreadsheet:
+    python -m pytest test_validate.py
+"""
+
+import warnings
+from fake import FakeSpreadsheet, HEADER, make_log
+from utility import READING_COL
+from validate import validate
+
+def test_not_working_meter():
+
+    rows = make_log(20)
+    last = len(rows)
+    rows[last - 3][READING_COL - 1] = "N.W."   # allowed by the header, so the next reading goes up by two runtimes
+    rows[last - 6][READING_COL - 1] = "1O5.5"  # a typo, only that row is reported
+
+    report = validate(FakeSpreadsheet({'A': rows}), ['A'])
+
+    assert report[['row', 'check']].values.tolist() == [[last - 5, 'reading']]
+
+def test_runtime_mismatch_is_reported():
+
+    rows = make_log(20)
+    rows[-1][READING_COL - 1] = f"{float(rows[-1][READING_COL - 1]) + 0.3:g}"
+
+    report = validate(FakeSpreadsheet({'A': rows}), ['A'])
+
+    assert report[['row', 'check']].values.tolist() == [[len(rows), 'runtime']]
+
+def test_log_problems_without_warnings():
+
+    dated = make_log(20)
+    dated[10][0] = "0x0" # a problem on a row, along with the problems about whole logs
+    overdue = make_log(60)
+    overdue[5][2] = "TOP UP POL"
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', FutureWarning)
+        empty = validate(FakeSpreadsheet({'A': dated, 'B': [list(HEADER)]}), ['A', 'B'])
+        late = validate(FakeSpreadsheet({'A': dated, 'C': overdue}), ['A', 'C'])
+
+    assert empty['check'].tolist() == ['date', 'no entries']
+    assert late['check'].tolist() == ['date', 'POL overdue']
+    assert late['value'].tolist() == ["0x0", "28.5"]
@@ -0,0 +1,78 @@
+"""
+Checks the shared write queue against the fake spreadsheet:
+    python -m pytest test_writequeue.py
+"""
+
+import threading
+from datetime import date, timedelta
+from fake import FakeSpreadsheet, make_log
+from journal import update_rows
+from sheet import batch_read, Sheet
+from writequeue import autofill_batch, commit
+
+def spreadsheet(**kwargs) -> FakeSpreadsheet:
+
+    behind = date.today() - timedelta(days=28)
+    return FakeSpreadsheet({'X': make_log(20, behind), 'Y': make_log(20, behind)}, **kwargs)
+
+def planned(ss: FakeSpreadsheet, gen: str) -> dict:
+
+    return Sheet(ss, gen).autofill(gen, "A", data=batch_read(ss, [gen])[gen])
+
+def sessions(*targets) -> list:
+    """
+    Runs every target in a thread of its own, like sessions of the app, and returns their results in order.
+    """
+
+    results = [None] * len(targets)
+
+    def run(i: int):
+        results[i] = targets[i]()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(targets))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+
+    return results
+
+def test_stale_plan_is_rejected():
+
+    ss = spreadsheet()
+    first, second = planned(ss, 'X'), planned(ss, 'X') # two sessions planning from the same last row
+
+    results = sessions(lambda: commit(ss, {'X': first})['X'], lambda: commit(ss, {'X': second})['X'])
+
+    assert sorted(e is None for e in results) == [False, True]
+    assert "Log changed since autofill was planned" in str(next(e for e in results if e is not None))
+    assert len(ss.tab('X').cells({})) == update_rows(first)[1]
+
+def test_generators_share_a_write():
+
+    ss = spreadsheet()
+    updates = {gen: planned(ss, gen) for gen in ('X', 'Y')}
+
+    ss.reset_stats()
+    assert commit(ss, updates) == {'X': None, 'Y': None}
+    assert ss.stats['calls']['values_batch_update'] == 1
+
+def test_edit_drive_has_not_reported():
+
+    ss = spreadsheet(drive_lag=60)
+    update = planned(ss, 'X')
+    last = ss.tab('X').cells({})[-1]
+    ss.edit('X', [last[0], "EDITED IN SHEETS", "EAS"]) # typed into the sheet, Drive still reports the earlier time
+
+    assert commit(ss, {'X': update})['X'] is not None
+    assert ss.tab('X').cells({})[-1][1] == "EDITED IN SHEETS"
+
+def test_sessions_autofilling_together():
+
+    ss = spreadsheet()
+    results = sessions(*[lambda: autofill_batch(ss, ['X', 'Y'], "A") for _ in range(3)])
+
+    for gen in ('X', 'Y'):
+        assert any(result[gen] is None for result in results)
+        dates = [row[0] for row in ss.tab(gen).cells({}) if len(row) > 2 and row[2] == "EAS"]
+        assert len(dates) == len(set(dates)) # no week written twice
@@ -1,4 +1,4 @@
-from datetime import datetime, date
+import pandas as pd
 
 DATE_READ_FORMAT = '%d%m%y'
 DATE_WRITE_FORMAT = '%d%m%y'
@@ -13,25 +13,23 @@ NUM_COLS = 13
 
 EAS_ENTRY_STD_DEV = 0.02
 
-def isfloat(str: str) -> bool:
-    try:
-        float(str)
-        return True
-    except ValueError:
-        return False
+def parse_dates(values) -> pd.Series:
+    """
+    Parses a column of dates in DATE_READ_FORMAT at once. Cells that are not dates become NaT.
+    """
+    return pd.to_datetime(pd.Series(values, dtype='string'), format=DATE_READ_FORMAT, errors='coerce')
 
-def isdate(date: date) -> bool:
-    try:
-        datetime.strptime(date, DATE_READ_FORMAT).date()
-        return True
-    except ValueError:
-        return False
+def parse_numbers(values) -> pd.Series:
+    """
+    Parses a column of readings or runtimes at once. Cells that are not numbers become NaN.
+    """
+    return pd.to_numeric(pd.Series(values, dtype='string').str.strip(), errors='coerce')
 
-def format_date(d: str):
-    if (not d.isdigit()):
-        return d
-    else:
-        if (len(d) < 6):
-            d = '0' + d
-        d_date = datetime.strptime(d, DATE_READ_FORMAT)
-        return datetime.strftime(d_date, DATE_WRITE_FORMAT)
+def last_valid(values: pd.Series) -> tuple[int, object] | None:
+    """
+    Returns the position and value of the last cell that is not NaN/NaT, or None if there is none.
+    """
+    index = values.last_valid_index()
+    if index is None:
+        return None
+    return (index, values[index])
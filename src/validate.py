@@ -0,0 +1,147 @@
+import gspread
+import numpy as np
+import pandas as pd
+from generators import get_registry
+from mirror import get_mirror, HEADER_ROW
+from planner import POL_LIMIT
+from sheet import batch_read
+from utility import parse_dates, parse_numbers, DATE_COL, ENTRY_COL, RUNTIME_COL, READING_COL
+
+TOLERANCE = 0.005 # readings and runtimes are written to 2 decimal places
+NOT_WORKING = r'N\.?W\.?' # what the meter reading header asks for when the meter is not working
+
+REPORT_COLUMNS = ['generator', 'row', 'check', 'value', 'message']
+
+def load_columns(sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], full: bool = False) -> pd.DataFrame:
+    """
+    Returns the date, entry, runtime and reading columns of every generator in one long DataFrame with its sheet row numbers.
+    Only the rows mirrored for autofill (at least the last TAIL_ROWS and back to the last POL top up, see batch_read)
+    are loaded unless full is True.
+    API CALLS: 1-2, 1-3 if full is True (more for tabs not mirrored yet)
+    """
+
+    mirror = get_mirror(sheet)
+
+    if full:
+        mirror.sync(sheet, gens)
+        mirror.extend(sheet, gens)
+    else:
+        batch_read(sheet, gens)
+
+    cols = {'date': DATE_COL, 'entry': ENTRY_COL, 'runtime': RUNTIME_COL, 'reading': READING_COL}
+    frames = []
+
+    for gen in gens:
+        start = HEADER_ROW + 1 if full else max(HEADER_ROW + 1, mirror.tab(gen)['lo'])
+        columns = mirror.columns(gen, cols, start)
+        rows = max(len(values) for values in columns.values())
+
+        frame = pd.DataFrame({key: values + [''] * (rows - len(values)) for key, values in columns.items()}, dtype='string')
+        frame.insert(0, 'row', start + np.arange(rows))
+        frame.insert(0, 'generator', gen)
+        frames.append(frame)
+
+    return pd.concat(frames, ignore_index=True)
+
+def issues(df: pd.DataFrame, mask: pd.Series, check: str, value: pd.Series, message: str) -> pd.DataFrame:
+
+    found = df.loc[mask, ['generator', 'row']].copy()
+    found['check'] = check
+    found['value'] = value[mask].astype('string')
+    found['message'] = message
+
+    return found
+
+def gen_issues(gens: list[str], check: str, value: pd.Series | None, message: str) -> pd.DataFrame:
+    """
+    Returns one problem for every generator in gens that is about the whole log rather than a row, with value (if any) by generator.
+    """
+
+    return pd.DataFrame({
+        'generator': gens,
+        'row': pd.array([pd.NA] * len(gens), dtype='Int64'),
+        'check': check,
+        'value': pd.array([pd.NA] * len(gens) if value is None else value.reindex(gens).astype(str), dtype='string'),
+        'message': message,
+    })
+
+def check_columns(df: pd.DataFrame, gens: list[str]) -> pd.DataFrame:
+    """
+    Checks the invariants of the logs of gens in df (see load_columns) with whole-column operations, returning one row per problem.
+    """
+
+    no_quote = df['date'].str.fullmatch(r'\d{5}').fillna(False) # 050324 read as the number 50324
+
+    dates = parse_dates(df['date']).mask(no_quote)
+    readings = parse_numbers(df['reading'])
+    runtimes = parse_numbers(df['runtime'])
+    by_gen = df['generator']
+
+    # the last valid value before every row of the same generator
+    previous_date = dates.groupby(by_gen).ffill().groupby(by_gen).shift()
+    previous_reading = readings.groupby(by_gen).ffill().groupby(by_gen).shift()
+
+    written_date = df['date'].str.strip() != ''
+    written_reading = df['reading'].str.strip() != ''
+    not_working = df['reading'].str.strip().str.fullmatch(NOT_WORKING, case=False).fillna(False)
+
+    # the reading written last before every row with one, if it was a number (not e.g. N.W. or a typo)
+    last_written = readings[written_reading].groupby(by_gen[written_reading]).shift().reindex(df.index)
+
+    top_ups = (df['entry'] == "TOP UP POL").fillna(False) & readings.notna()
+    pol_readings = readings[top_ups]
+    pol_intervals = pol_readings - pol_readings.groupby(by_gen[top_ups]).shift()
+
+    delta = (readings - last_written).round(2) # unknown after a reading that is not a number
+
+    found = [
+        issues(df, no_quote, 'date', df['date'], "Date lost its leading zero, add a single quote (') before it"),
+        issues(df, written_date & dates.isna() & ~no_quote, 'date', df['date'], "Not a date in DDMMYY format"),
+        issues(df, (dates < previous_date).fillna(False), 'date order', df['date'], "Date is before the previous entry"),
+        issues(df, written_reading & readings.isna() & ~not_working, 'reading', df['reading'], "Not a number"),
+        issues(df, (readings < previous_reading).fillna(False), 'reading order', df['reading'], "Reading is lower than the previous reading"),
+        issues(df, runtimes.notna() & ((delta - runtimes).abs() > TOLERANCE).fillna(False), 'runtime', df['runtime'],
+               "Runtime does not match the change in reading"),
+        issues(df.loc[top_ups], (pol_intervals > POL_LIMIT + TOLERANCE).fillna(False), 'POL interval', pol_intervals.round(2),
+               f"Runtime between POL top ups is over {POL_LIMIT:g}h"),
+    ]
+
+    # generators autofill cannot start from
+    started = (dates.notna().groupby(by_gen).any() & readings.notna().groupby(by_gen).any()).reindex(gens, fill_value=False)
+    found.append(gen_issues(list(started.index[~started]), 'no entries', None, "Sheet needs at least one runtime entry before autofill"))
+
+    # runtime since the last POL top up, where there was one
+    last_reading = readings.groupby(by_gen).last()
+    last_pol = pol_readings.groupby(by_gen[top_ups]).last()
+    overdue = (last_reading.reindex(last_pol.index) - last_pol).round(2)
+    overdue = overdue[overdue > POL_LIMIT + TOLERANCE]
+    found.append(gen_issues(list(overdue.index), 'POL overdue', overdue, f"Runtime since the last POL top up is over {POL_LIMIT:g}h"))
+
+    report = pd.concat([frame for frame in found if len(frame) > 0], ignore_index=True) if any(len(frame) > 0 for frame in found) else pd.DataFrame(columns=REPORT_COLUMNS)
+
+    return report[REPORT_COLUMNS].sort_values(['generator', 'row'], kind='stable', ignore_index=True)
+
+def validate(sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], full: bool = False) -> pd.DataFrame:
+    """
+    Returns every problem found in the logs of gens that would break autofill or is likely a typo, one row per problem,
+    with the generator, sheet row (if any), check, offending value and message.
+    Only the last rows of each log (see load_columns) are checked unless full is True.
+    Generators without a tab are reported as such, and the other logs are still checked.
+    API CALLS: 1-2, 1-3 if full is True (more for tabs not mirrored yet or not in the registry)
+    """
+
+    if len(gens) == 0:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    missing = get_registry(sheet).missing(gens) # their ranges would fail the read of every other tab
+    found = [gen for gen in gens if gen not in missing]
+
+    reports = [gen_issues(missing, 'tab', None, "No tab for this generator in the spreadsheet")]
+    if len(found) > 0:
+        reports.append(check_columns(load_columns(sheet, found, full), found))
+
+    reports = [report for report in reports if len(report) > 0]
+    if len(reports) == 0:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+
+    return pd.concat(reports, ignore_index=True).sort_values(['generator', 'row'], kind='stable', ignore_index=True)
@@ -0,0 +1,198 @@
+import threading
+import time
+import gspread
+from concurrent.futures import Future
+from datetime import date
+from gspread.exceptions import WorksheetNotFound
+from journal import get_journal, update_rows
+from sheet import batch_read, batch_write, generator_rng, tab_data, Sheet
+
+FLUSH_DELAY = 0.5 # seconds a flush waits for commits from other sessions to write together
+
+class WriteQueue:
+    """
+    Autofill commits of every session waiting to be written to one spreadsheet.
+
+    A background thread flushes the queue every FLUSH_DELAY seconds while it is not empty, writing the next commit
+    of every generator in a single request, so that sessions autofilling at the same time share their writes and
+    write quota, and each generator is only written by one commit at a time. Before writing, the tabs are fetched
+    again, whatever Drive reports, to check that each still ends on the row its commit was planned from; a commit
+    planned from a row that has since been written to (e.g. by another session autofilling the same generator,
+    or someone in the sheet) is not written.
+    """
+
+    def __init__(self, sheet: gspread.spreadsheet.Spreadsheet):
+
+        self.sheet = sheet
+        self.pending = {} # generator -> [(update, future)] in the order they were submitted
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, sheet: gspread.spreadsheet.Spreadsheet, gen: str, update: dict) -> Future:
+        """
+        Queues the value range returned by Sheet.autofill for a generator. Returns a future that is done once
+        it is written, or holds the exception that stopped it.
+        """
+
+        future = Future()
+
+        with self.lock:
+            self.sheet = sheet # the latest handle, in case the older one was dropped (see reconnect)
+            self.pending.setdefault(gen, []).append((update, future))
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.work, daemon=True)
+                self.thread.start()
+
+        return future
+
+    def work(self):
+
+        while True:
+            time.sleep(FLUSH_DELAY)
+
+            with self.lock:
+                batch = {gen: commits.pop(0) for gen, commits in self.pending.items()}
+                self.pending = {gen: commits for gen, commits in self.pending.items() if len(commits) > 0}
+                sheet = self.sheet
+
+                if len(batch) == 0:
+                    self.thread = None
+                    return
+
+            try:
+                self.flush(sheet, batch)
+
+            except Exception as e: # never leave a session waiting
+                print(f"Error flushing the write queue: {e}") # debug text
+                for _, future in batch.values():
+                    if not future.done():
+                        future.set_exception(e)
+
+    def flush(self, sheet: gspread.spreadsheet.Spreadsheet, batch: dict[str, tuple[dict, Future]]):
+        """
+        Writes one commit of every generator in batch, after checking that their tabs have not changed since they were planned.
+        API CALLS: 2-3, one of them to the Drive API (more for tabs not mirrored yet)
+        """
+
+        try:
+            data = batch_read(sheet, list(batch), force=True) # edits Drive has not reported yet must be seen too
+
+        except Exception as e:
+            for _, future in batch.values():
+                future.set_exception(e)
+            return
+
+        updates = {}
+        for gen, (update, future) in batch.items():
+            try:
+                columns = tab_data(data, gen)
+            except WorksheetNotFound as e: # e.g. deleted since it was planned
+                future.set_exception(e)
+                continue
+
+            row = columns['start'] - 1 + len(columns['dates']) # last row, as in Sheet.get_latest_date
+
+            if row != update_rows(update)[0] - 1:
+                future.set_exception(ValueError(f"Log changed since autofill was planned (now ends on row {row}), autofill it again"))
+                continue
+
+            updates[gen] = update
+
+        try:
+            batch_write(sheet, updates)
+
+        except Exception as e:
+            for gen in updates:
+                batch[gen][1].set_exception(e)
+            return
+
+        if len(updates) > 0:
+            print(f"Wrote autofill of {len(updates)} generators: {', '.join(updates)}") # debug text
+
+        for gen in updates:
+            batch[gen][1].set_result(None)
+
+queues = {} # spreadsheet id -> WriteQueue
+queues_lock = threading.Lock()
+
+def get_write_queue(sheet: gspread.spreadsheet.Spreadsheet) -> WriteQueue:
+
+    with queues_lock:
+        if sheet.id not in queues:
+            queues[sheet.id] = WriteQueue(sheet)
+
+        return queues[sheet.id]
+
+def commit(sheet: gspread.spreadsheet.Spreadsheet, updates: dict[str, dict]) -> dict[str, Exception | None]:
+    """
+    Queues the value ranges returned by Sheet.autofill, keyed by generator, and waits until they are written.
+    Returns a dict mapping each generator to None if it was written, or to the exception that stopped it.
+    API CALLS: 2-3 per flush, shared with the commits of other sessions
+    """
+
+    queue = get_write_queue(sheet)
+    futures = {gen: queue.submit(sheet, gen, update) for gen, update in updates.items()}
+
+    return {gen: future.exception() for gen, future in futures.items()}
+
+def autofill_batch(sheet: gspread.spreadsheet.Spreadsheet, gens: list[str], name: str="", end_date: date=date.today(), end_val: int | None = None, seed: int | None = None, run: str | None = None) -> dict[str, Exception | None]:
+    """
+    Autofills every generator in gens using one batched read, and writes them through the shared write queue (see WriteQueue).
+    If run is given (see journal.run_id), the planned rows and their commit status are journaled, so that a retry of the run
+    skips the generators already written and writes the rows planned for the others, as long as their tabs have not changed since.
+    Returns a dict mapping each generator to None if it was updated, or to the exception that stopped it.
+    API CALLS: 1-2 (more for tabs not mirrored yet, see batch_read), and 2-3 per flush of the write queue (see WriteQueue.flush)
+    """
+
+    journal = None if run is None else get_journal(sheet)
+    entries = {} if journal is None else journal.entries(run, gens)
+    results = {}
+
+    # a resumed run checks every tab against its journal, which must not miss an edit Drive has not reported yet
+    data = batch_read(sheet, gens, force=len(entries) > 0)
+    updates = {}
+
+    for gen in gens:
+        try:
+            log = Sheet(sheet, gen)
+            log.data.update(tab_data(data, gen))
+            entry = entries.get(gen)
+
+            if entry is not None and entry['update'] is not None:
+                latest = log.get_latest_date()
+                row = 0 if latest is None else latest[1]
+
+                if row == entry['last_row']: # written by an earlier attempt, and the tab has not changed since
+                    journal.commit(run, [gen])
+                    results[gen] = None
+                    continue
+
+                if entry['status'] != 'committed' and row == entry['first_row'] - 1: # the tab still ends where the planned rows start
+                    updates[gen] = entry['update']
+                    results[gen] = None
+                    continue
+
+                print(f"Log for {gen} changed since the last attempt, planning it again") # debug text
+
+            update = log.autofill(gen, name, end_date, end_val, tab_data(data, gen), rng=generator_rng(seed, gen))
+            if journal is not None:
+                journal.plan(run, gen, update)
+            if update is not None:
+                updates[gen] = update
+            results[gen] = None
+
+        except Exception as e:
+            results[gen] = e
+
+    # written together with the autofills of other sessions, once the tabs are checked to still end where they were planned from
+    for gen, e in commit(sheet, updates).items():
+        results[gen] = e
+
+        if journal is not None:
+            if e is None:
+                journal.commit(run, [gen])
+            else:
+                journal.fail(run, [gen], e)
+
+    return results